@@ -0,0 +1,312 @@
+"""Offline benchmark of the agent loop against a scripted mock chat-completions server.
+
+Each scenario replays a fixed tool-call script (see `mock_server.py`) in a scratch
+workspace, so the numbers measure grok_cli itself rather than the network or the model:
+
+    many_reads         one step with 20 parallel `read_file` calls, per turn
+    large_files        paged reads deep into a 20 MB file
+    long_conversation  many text-only turns; exercises memory pruning and summaries
+    many_iterations    20 sequential read/edit steps in one turn
+
+Scenarios run through `GrokAgent.invoke` (path "chat") and through `cli.main --prompt`
+(path "cli", one process-style invocation per turn, streaming and rendering included),
+each in a fresh interpreter. Reported per scenario and path:
+
+    overhead_ms_per_iteration  turn wall time minus tool time and mock server time, per LLM call
+    tool_ms_per_turn           wall time with at least one tool running
+    token_counting_ms_per_turn time spent counting prompt tokens
+    peak_rss_mb, rss_growth_mb peak resident memory, and growth from the first to the last turn
+
+Usage:
+    python benchmarks/agent_loop.py [--scenario NAME ...] [--path chat|cli] [--turns N] [--output FILE] [--json]
+    python benchmarks/agent_loop.py --compare BASELINE.json CURRENT.json [--threshold 10]
+
+The mock server speaks the OpenAI protocol only; tiktoken's encoding must already be in
+its local cache (as it is after any online run), since token counting is measured too.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from mock_server import MockServer, text_step, tool_step  # noqa: E402
+
+PATHS = ("chat", "cli")
+# Metrics where a higher value is a regression, checked by --compare
+COMPARED_METRICS = ("overhead_ms_per_iteration", "tool_ms_per_turn", "token_counting_ms_per_turn", "peak_rss_mb")
+MIN_REGRESSION = 1.0  # ms or MB; smaller absolute changes are noise, whatever the percentage
+LOREM = "the agent reads files edits code runs tests and reports results back to the user".split()
+
+
+def _words(count, offset=0):
+    return " ".join(LOREM[(offset + i) % len(LOREM)] for i in range(count))
+
+
+# --- Scenarios ---
+
+def _many_reads_setup(workspace):
+    for i in range(50):
+        with open(os.path.join(workspace, f"module_{i}.py"), "w") as f:
+            f.write("\n".join(f"def function_{i}_{n}():  # {_words(8, n)}" for n in range(100)))
+
+
+def _large_files_setup(workspace):
+    with open(os.path.join(workspace, "large.log"), "w") as f:
+        for n in range(250_000):
+            f.write(f"{n:07d} INFO {_words(12, n)}\n")  # ~20 MB
+
+
+def _many_iterations_setup(workspace):
+    with open(os.path.join(workspace, "counter.py"), "w") as f:
+        f.write("value = 0\n" + "\n".join(f"# {_words(10, n)}" for n in range(200)) + "\n")
+
+
+SCENARIOS = {
+    "many_reads": {
+        "turns": 5,
+        "setup": _many_reads_setup,
+        "script": [tool_step(*[("read_file", {"file_path": f"module_{i}.py"}) for i in range(20)]),
+                   text_step("Read 20 modules.")],
+    },
+    "large_files": {
+        "turns": 3,
+        "setup": _large_files_setup,
+        "script": [tool_step(("read_file", {"file_path": "large.log", "start_line": 1 + k * 50_000,
+                                            "end_line": 1_000 + k * 50_000})) for k in range(5)]
+                  + [text_step("Paged through the log.")],
+    },
+    "long_conversation": {
+        "turns": 40,
+        "setup": None,
+        "script": [text_step(_words(400))],
+    },
+    "many_iterations": {
+        "turns": 2,
+        "setup": _many_iterations_setup,
+        "before_turn": _many_iterations_setup,  # The script's edits assume a fresh counter
+        "script": [step for k in range(10) for step in (
+            tool_step(("read_file", {"file_path": "counter.py", "start_line": 1, "end_line": 20})),
+            tool_step(("edit_file", {"file_path": "counter.py", "old_text": f"value = {k}\n", "new_text": f"value = {k + 1}\n"})),
+        )] + [text_step("Counted to 10.")],
+    },
+}
+
+
+# --- Measurement (child process) ---
+
+def _rss_mb():
+    """Current resident set size; falls back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return _peak_rss_mb()
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10  # bytes on macOS, KB on Linux
+
+
+def _union_seconds(intervals):
+    """Total length covered by possibly overlapping `(start, end)` intervals."""
+    total, covered_until = 0.0, float("-inf")
+    for start, end in sorted(intervals):
+        if end > covered_until:
+            total += end - max(start, covered_until)
+            covered_until = end
+    return total
+
+
+def _turn_metrics(events, wall_s, server_s):
+    """Per-turn figures from Chrome trace events (as written by `--trace` / `TurnTrace.to_events`)."""
+    spans = [event for event in events if event.get("ph") == "X" and event["cat"] != "turn"]
+    iterations = sum(1 for event in spans if event["cat"] == "llm")
+    tool_s = _union_seconds([(event["ts"] / 1e6, (event["ts"] + event["dur"]) / 1e6) for event in spans if event["cat"] == "tool"])
+    return {
+        "wall_ms": wall_s * 1000,
+        "iterations": iterations,
+        "tool_ms": tool_s * 1000,
+        "tool_bytes_in": sum(event["args"].get("bytes_in", 0) for event in spans if event["cat"] == "tool"),
+        "tool_bytes_out": sum(event["args"].get("bytes_out", 0) for event in spans if event["cat"] == "tool"),
+        "token_counting_ms": sum(event["dur"] for event in spans if event["cat"] == "tokens") / 1000,
+        "server_ms": server_s * 1000,
+        "overhead_ms": max(0.0, wall_s - tool_s - server_s) * 1000,
+    }
+
+
+def _run_chat_turn(agent, prompt):
+    started = time.perf_counter()
+    agent.invoke(prompt)  # Raises, unlike chat, so a failed turn is reported as an error rather than timed
+    wall_s = time.perf_counter() - started
+    if hasattr(agent.memory, "wait_for_summary"):
+        agent.memory.wait_for_summary()  # Background summaries are not part of the turn
+    return agent.last_trace.to_events(os.getpid()), wall_s
+
+
+def _run_cli_turn(base_url, prompt, trace_path):
+    from grok_cli.cli import main
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        main(["--prompt", prompt, "--api-key", "benchmark", "--base-url", base_url, "--trace", trace_path],
+             standalone_mode=False)
+    wall_s = time.perf_counter() - started
+    with open(trace_path) as f:
+        return json.load(f)["traceEvents"], wall_s
+
+
+def run_scenario(name, path, turns):
+    """Runs one scenario in this process and returns its aggregated metrics."""
+    scenario = SCENARIOS[name]
+    turns = turns or scenario["turns"]
+    workspace = tempfile.mkdtemp(prefix=f"grok-bench-{name}-")
+    os.environ["GROK_CLI_CACHE_DIR"] = os.path.join(workspace, ".cache")
+    os.chdir(workspace)
+    if scenario["setup"]:
+        scenario["setup"](workspace)
+
+    server = MockServer(scenario["script"])
+    base_url = server.start()
+    agent = None
+    if path == "chat":
+        from grok_cli.agent import GrokAgent
+        agent = GrokAgent(api_key="benchmark", base_url=base_url)
+
+    per_turn, rss = [], []
+    for turn in range(turns):
+        if scenario.get("before_turn"):
+            scenario["before_turn"](workspace)
+        server.reset_stats()
+        prompt = f"Turn {turn}: {_words(20, turn)}"
+        if path == "chat":
+            events, wall_s = _run_chat_turn(agent, prompt)
+        else:
+            events, wall_s = _run_cli_turn(base_url, prompt, os.path.join(workspace, "trace.json"))
+        per_turn.append(_turn_metrics(events, wall_s, server.server_seconds))
+        rss.append(_rss_mb())
+    server.stop()
+
+    measured = per_turn[1:] or per_turn  # The first turn pays one-off costs (imports, connections)
+    iterations = sum(turn["iterations"] for turn in measured) or 1
+    return {
+        "scenario": name,
+        "path": path,
+        "turns": turns,
+        "iterations_per_turn": round(iterations / len(measured), 2),
+        "wall_ms_per_turn": round(sum(turn["wall_ms"] for turn in measured) / len(measured), 3),
+        "overhead_ms_per_iteration": round(sum(turn["overhead_ms"] for turn in measured) / iterations, 3),
+        "tool_ms_per_turn": round(sum(turn["tool_ms"] for turn in measured) / len(measured), 3),
+        "tool_bytes_in_per_turn": sum(turn["tool_bytes_in"] for turn in measured) // len(measured),
+        "tool_bytes_out_per_turn": sum(turn["tool_bytes_out"] for turn in measured) // len(measured),
+        "token_counting_ms_per_turn": round(sum(turn["token_counting_ms"] for turn in measured) / len(measured), 3),
+        "server_ms_per_turn": round(sum(turn["server_ms"] for turn in measured) / len(measured), 3),
+        "first_turn_wall_ms": round(per_turn[0]["wall_ms"], 3),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "rss_growth_mb": round(rss[-1] - rss[0], 1),
+    }
+
+
+# --- Orchestration (parent process) ---
+
+def _run_child(name, path, turns):
+    command = [sys.executable, os.path.abspath(__file__), "--child", name, "--path", path]
+    if turns:
+        command += ["--turns", str(turns)]
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    result = subprocess.run(command, capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        return {"scenario": name, "path": path, "error": (result.stderr.strip().splitlines() or ["failed"])[-1]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current, threshold):
+    """Prints metric changes between two result files; returns the regressions beyond `threshold` percent."""
+    baseline_runs = {(run["scenario"], run["path"]): run for run in baseline["results"]}
+    regressions = []
+    print(f"baseline {baseline.get('commit')} -> current {current.get('commit')}")
+    for run in current["results"]:
+        key = (run["scenario"], run["path"])
+        before = baseline_runs.get(key)
+        if before is None or "error" in run or "error" in before:
+            continue
+        print(f"{run['scenario']} ({run['path']})")
+        for metric in COMPARED_METRICS:
+            old, new = before[metric], run[metric]
+            change = (new - old) / old * 100 if old else 0.0
+            flag = ""
+            if change > threshold and new - old >= MIN_REGRESSION:
+                flag = "  REGRESSION"
+                regressions.append(f"{key[0]}/{key[1]} {metric} +{change:.0f}%")
+            print(f"    {metric:<28}{old:>12.3f} -> {new:>12.3f}  {change:+6.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario to run (repeatable). Defaults to all.")
+    parser.add_argument("--path", choices=PATHS, default=None, help="Only drive GrokAgent.invoke or only cli.main. Defaults to both.")
+    parser.add_argument("--turns", type=int, default=None, help="Override each scenario's number of turns.")
+    parser.add_argument("--output", default=None, help="Also write the JSON results to this file.")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results only.")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="Compare two result files instead of running.")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Percent increase --compare reports as a regression.")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        warnings.filterwarnings("ignore")
+        print(json.dumps(run_scenario(args.child, args.path or "chat", args.turns)))
+        return
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        for regression in regressions:
+            print(f"FAIL: {regression}")
+        sys.exit(1 if regressions else 0)
+
+    paths = [args.path] if args.path else list(PATHS)
+    results = [_run_child(name, path, args.turns) for name in (args.scenario or SCENARIOS) for path in paths]
+    report = {"commit": _commit(), "python": sys.version.split()[0], "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'scenario':<18} {'path':<5} {'overhead ms/iter':>17} {'tool ms/turn':>13} {'tokens ms/turn':>15} "
+              f"{'peak RSS MB':>12} {'RSS growth MB':>14}")
+        for run in results:
+            if "error" in run:
+                print(f"{run['scenario']:<18} {run['path']:<5} error: {run['error']}")
+                continue
+            print(f"{run['scenario']:<18} {run['path']:<5} {run['overhead_ms_per_iteration']:>17.2f} {run['tool_ms_per_turn']:>13.2f} "
+                  f"{run['token_counting_ms_per_turn']:>15.2f} {run['peak_rss_mb']:>12.1f} {run['rss_growth_mb']:>14.1f}")
+    sys.exit(1 if any("error" in run for run in results) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Scripted OpenAI-compatible chat-completions server for offline benchmarks.
+
+The server answers `POST .../chat/completions` (streaming or not) from a script: a list
+of steps, each either a batch of tool calls or a final text answer. Which step to play
+is decided by the request itself (the number of assistant messages since the last user
+message), so any number of agents and turns can share one server. Requests without tools
+(conversation summaries) get a short fixed summary.
+
+    server = MockServer(script)
+    server.start()      # base URL for GrokAgent(base_url=...) / --base-url
+    ...
+    server.stop()
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUMMARY_TEXT = "The user and the assistant worked on files in the workspace."
+
+
+def tool_step(*calls):
+    """A step that calls tools; each call is `(name, arguments_dict)`."""
+    return {"tool_calls": list(calls)}
+
+
+def text_step(text):
+    """A step that answers with text and ends the turn."""
+    return {"text": text}
+
+
+def _usage(body, step):
+    prompt_chars = sum(len(str(message.get("content") or "")) for message in body.get("messages", []))
+    completion_chars = len(step.get("text") or json.dumps(step.get("tool_calls")))
+    prompt_tokens, completion_tokens = prompt_chars // 4 + 1, completion_chars // 4 + 1
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, as a real endpoint
+    disable_nagle_algorithm = True  # Small writes would otherwise stall on delayed ACKs
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        started = time.perf_counter()
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        step = self.server.mock.step_for(body)
+        if body.get("stream"):
+            self._stream(body, step)
+        else:
+            self._respond(body, step)
+        self.server.mock.record(time.perf_counter() - started)
+
+    def _message(self, step):
+        if "tool_calls" in step:
+            calls = [{"id": f"call_{step['index']}_{i}", "type": "function",
+                      "function": {"name": name, "arguments": json.dumps(arguments)}}
+                     for i, (name, arguments) in enumerate(step["tool_calls"])]
+            return {"role": "assistant", "content": None, "tool_calls": calls}, "tool_calls"
+        return {"role": "assistant", "content": step["text"]}, "stop"
+
+    def _respond(self, body, step):
+        message, finish_reason = self._message(step)
+        payload = json.dumps({
+            "id": "chatcmpl-mock", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": _usage(body, step),
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, body, step):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write(data):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+        def send(choices, **extra):
+            chunk = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": 0,
+                     "model": body["model"], "choices": choices, **extra}
+            write(b"data: " + json.dumps(chunk).encode() + b"\n\n")
+
+        message, finish_reason = self._message(step)
+        if "tool_calls" in message:
+            calls = [dict(call, index=i) for i, call in enumerate(message["tool_calls"])]
+            send([{"index": 0, "delta": {"role": "assistant", "tool_calls": calls}, "finish_reason": None}])
+        else:
+            words = message["content"].split(" ")
+            for i in range(0, len(words), 8):  # A few words per delta, like a real stream
+                send([{"index": 0, "delta": {"content": " ".join(words[i:i + 8]) + " "}, "finish_reason": None}])
+        send([{"index": 0, "delta": {}, "finish_reason": finish_reason}])
+        send([], usage=_usage(body, step))
+        write(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class MockServer:
+    """Serves `script` (a list of steps, played once per user turn) on a local port."""
+
+    def __init__(self, script, final_text="Done."):
+        self.script = script
+        self.final_text = final_text
+        self.requests = 0
+        self.server_seconds = 0.0  # Time spent building responses, to subtract from client timings
+        self._lock = threading.Lock()
+        self._httpd = None
+
+    def step_for(self, body):
+        if not body.get("tools"):
+            return text_step(SUMMARY_TEXT)
+        messages = body["messages"]
+        last_user = max((i for i, message in enumerate(messages) if message["role"] == "user"), default=0)
+        index = sum(1 for message in messages[last_user:] if message["role"] == "assistant")
+        step = self.script[index] if index < len(self.script) else text_step(self.final_text)
+        return dict(step, index=index)
+
+    def record(self, seconds):
+        with self._lock:
+            self.requests += 1
+            self.server_seconds += seconds
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = 0
+            self.server_seconds = 0.0
+
+    def start(self):
+        """Starts serving on a free port and returns the base URL."""
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self
+        threading.Thread(target=self._httpd.serve_forever, name="mock-openai", daemon=True).start()
+        return f"http://127.0.0.1:{self._httpd.server_port}/v1"
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
@@ -0,0 +1,150 @@
+"""Startup benchmark for the grok_cli entry point.
+
+Reports an import-time breakdown of `grok_cli.cli` and `grok_cli.agent`, the wall-clock
+time of `grok_cli --help`, and the wall-clock time until the interactive prompt is drawn.
+Each timing is the median of several fresh interpreter runs. Exits non-zero when a budget
+is exceeded or when `--help` loads langchain, so it can guard against regressions in CI.
+
+Usage:
+    python benchmarks/startup.py [--runs 5] [--budget-ms 400] [--json]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_PACKAGES = ("langchain", "langchain_core", "langchain_openai", "langchain_community", "tiktoken", "openai")
+
+
+def _env():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = REPO_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    env.setdefault("XAI_API_KEY", "benchmark-placeholder-key")
+    return env
+
+
+def import_breakdown(module, top=10):
+    """Returns the total import time of `module` in ms and the packages that cost the most.
+
+    Self times from `-X importtime` are summed per top-level package, so the breakdown
+    reads as "langchain_core: 900 ms, openai: 300 ms" rather than one nested tree.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=_env(), cwd=REPO_ROOT,
+    )
+    per_package = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+\d+ \|\s*(\S+)", line)
+        if match:
+            package = match.group(2).split(".")[0]
+            per_package[package] = per_package.get(package, 0) + int(match.group(1)) / 1000
+    ranked = sorted(per_package.items(), key=lambda entry: entry[1], reverse=True)
+    total = sum(per_package.values())
+    return {"module": module, "total_ms": round(total, 1), "top": [{"name": n, "ms": round(ms, 1)} for n, ms in ranked[:top]]}
+
+
+def help_timing():
+    """Times `grok_cli --help` and reports whether any heavy package got imported."""
+    probe = (
+        "import sys\n"
+        "sys.argv = ['grok_cli', '--help']\n"
+        "from grok_cli import cli\n"
+        "try:\n"
+        "    cli.main()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"heavy = sorted({{m.split('.')[0] for m in sys.modules}} & set({HEAVY_PACKAGES!r}))\n"
+        "sys.stderr.write('HEAVY=' + ','.join(heavy) + '\\n')\n"
+    )
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, env=_env(), cwd=REPO_ROOT)
+    elapsed = (time.perf_counter() - start) * 1000
+    heavy = re.search(r"HEAVY=(.*)", result.stderr)
+    return elapsed, [m for m in (heavy.group(1).split(",") if heavy else []) if m]
+
+
+def first_prompt_timing(timeout=30.0):
+    """Starts the interactive CLI on a pseudo-terminal and times until the `  > ` prompt appears."""
+    import pty
+    import select
+
+    pid, fd = pty.fork()
+    if pid == 0:
+        os.chdir(REPO_ROOT)
+        os.execve(sys.executable, [sys.executable, "-m", "grok_cli.cli"], _env())
+    start = time.perf_counter()
+    output = b""
+    elapsed = None
+    try:
+        while time.perf_counter() - start < timeout:
+            ready, _, _ = select.select([fd], [], [], 0.05)
+            if not ready:
+                continue
+            try:
+                chunk = os.read(fd, 4096)
+            except OSError:
+                break
+            if not chunk:
+                break
+            output += chunk
+            if b"  > " in output:
+                elapsed = (time.perf_counter() - start) * 1000
+                break
+    finally:
+        os.kill(pid, 9)
+        os.waitpid(pid, 0)
+        os.close(fd)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreter runs per timing (median is reported).")
+    parser.add_argument("--budget-ms", type=float, default=400.0, help="Budget for --help and for time to first prompt.")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results only.")
+    args = parser.parse_args()
+
+    help_runs = [help_timing() for _ in range(args.runs)]
+    help_ms = statistics.median(ms for ms, _ in help_runs)
+    heavy_on_help = sorted({m for _, mods in help_runs for m in mods})
+    prompt_runs = [ms for ms in (first_prompt_timing() for _ in range(args.runs)) if ms is not None] if os.name != "nt" else []
+    prompt_ms = statistics.median(prompt_runs) if prompt_runs else None
+
+    results = {
+        "imports": [import_breakdown("grok_cli.cli"), import_breakdown("grok_cli.agent")],
+        "help_ms": round(help_ms, 1),
+        "heavy_modules_on_help": heavy_on_help,
+        "first_prompt_ms": round(prompt_ms, 1) if prompt_ms is not None else None,
+        "budget_ms": args.budget_ms,
+    }
+    failures = []
+    if heavy_on_help:
+        failures.append(f"--help imported {', '.join(heavy_on_help)}")
+    if help_ms > args.budget_ms:
+        failures.append(f"--help took {help_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    if prompt_ms is not None and prompt_ms > args.budget_ms:
+        failures.append(f"first prompt took {prompt_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    results["failures"] = failures
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for breakdown in results["imports"]:
+            print(f"import {breakdown['module']}: {breakdown['total_ms']} ms")
+            for entry in breakdown["top"]:
+                print(f"    {entry['ms']:>9.1f} ms  {entry['name']}")
+        print(f"grok_cli --help: {results['help_ms']} ms (heavy modules: {', '.join(heavy_on_help) or 'none'})")
+        print(f"time to first prompt: {results['first_prompt_ms']} ms")
+        for failure in failures:
+            print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Microbenchmark for token counting as a conversation grows.
+
+Simulates a conversation turn by turn and times, per turn, what the memory does after
+each response: count the buffer and prune it back under `max_token_limit`. The legacy
+path loads the encoding on every call and recounts the whole buffer after each message
+it drops; the cached path is `IncrementalSummaryBufferMemory` backed by
+`grok_cli.tokens`. The cached cost per turn should stay flat as history grows.
+
+Usage:
+    python benchmarks/token_counting.py [--turns 200] [--max-token-limit 2000] [--json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tiktoken
+from langchain.memory import ConversationSummaryBufferMemory
+from langchain_core._api import LangChainDeprecationWarning
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from grok_cli.memory import IncrementalSummaryBufferMemory
+from grok_cli.tokens import to_message_dict
+
+warnings.filterwarnings("ignore", category=LangChainDeprecationWarning)
+
+WORDS = "the agent reads files edits code runs tests and reports results to the user".split()
+
+
+def legacy_num_tokens(messages):
+    """The counter as it was before caching: new encoder lookup and full re-encode per call."""
+    encoding = tiktoken.encoding_for_model("gpt-4")
+    num_tokens = 0
+    for message in messages:
+        num_tokens += 4
+        for key, value in message.items():
+            num_tokens += len(encoding.encode(value))
+            if key == "name":
+                num_tokens += -1
+    return num_tokens + 2
+
+
+class _LegacyCountingModel(FakeListChatModel):
+    def get_num_tokens_from_messages(self, messages, tools=None):
+        return legacy_num_tokens([to_message_dict(message) for message in messages])
+
+
+class _SummaryModel(FakeListChatModel):
+    def get_num_tokens_from_messages(self, messages, tools=None):
+        raise AssertionError("IncrementalSummaryBufferMemory should not call the model to count tokens")
+
+
+def _random_text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def run(memory, turns, seed=0):
+    rng = random.Random(seed)
+    timings = []
+    for _ in range(turns):
+        inputs = {"input": _random_text(rng, rng.randint(5, 40))}
+        outputs = {"output": _random_text(rng, rng.randint(20, 300))}
+        memory.chat_memory.add_user_message(inputs["input"])
+        memory.chat_memory.add_ai_message(outputs["output"])
+        start = time.perf_counter()
+        memory.prune()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--max-token-limit", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results only.")
+    args = parser.parse_args()
+
+    memories = {
+        "legacy": ConversationSummaryBufferMemory(llm=_LegacyCountingModel(responses=["summary"]), max_token_limit=args.max_token_limit),
+        "cached": IncrementalSummaryBufferMemory(llm=_SummaryModel(responses=["summary"]), max_token_limit=args.max_token_limit),
+    }
+    results = {name: run(memory, args.turns) for name, memory in memories.items()}
+
+    window = max(1, args.turns // 10)
+    report = {
+        name: [
+            {"turns": end, "avg_ms_per_turn": round(sum(timings[end - window:end]) / window, 3)}
+            for end in range(window, args.turns + 1, window)
+        ]
+        for name, timings in results.items()
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{'turns':>6}  {'legacy ms/turn':>15}  {'cached ms/turn':>15}")
+    for legacy, cached in zip(report["legacy"], report["cached"]):
+        print(f"{legacy['turns']:>6}  {legacy['avg_ms_per_turn']:>15.3f}  {cached['avg_ms_per_turn']:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
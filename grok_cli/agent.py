@@ -1,25 +1,57 @@
 import os
 import json
+import asyncio
+import contextlib
+import contextvars
+import functools
+import queue
+import threading
+import time
+import weakref
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 warnings.filterwarnings("ignore", category=DeprecationWarning, module='langchain')
-import tiktoken
 from langchain_openai import ChatOpenAI
-from langchain.memory import ConversationBufferMemory, ConversationSummaryBufferMemory
+from langchain.memory import ConversationBufferMemory
 from langchain_core.tools import tool
-from langchain.agents import AgentExecutor, create_tool_calling_agent
+from langchain.agents import AgentExecutor
+from langchain.agents.output_parsers.tools import ToolsAgentOutputParser
 from langchain.prompts import PromptTemplate
 from langchain_community.callbacks import get_openai_callback
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.callbacks.manager import adispatch_custom_event
 from langchain_core.messages import BaseMessage
-from typing import List
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+from langchain_core._api import LangChainDeprecationWarning
+from typing import List, Optional
+
+from .commands import DEFAULT_TIMEOUT_SECONDS, run_command as run_shell_command
+from .context import ContextBudget
+from .file_cache import read_text, write_text
+from .files import DEFAULT_MAX_BYTES, read_window
+from .memory import BackgroundSummaryBufferMemory
+from .patch import apply_patch as apply_unified_diff, patch_paths
+from .response_cache import DEFAULT_TTL_SECONDS, ResponseCache
+from .routing import ModelRouter, ModelUsage
+from .scratchpad import DEFAULT_SCRATCHPAD_TOKEN_BUDGET, ScratchpadCompactor
+from .workspace_index import get_index
+from .tokens import count_message_tokens, get_grok_num_tokens, to_message_dict
+from .tracing import TurnTrace, use_trace
+from .transport import get_async_http_client, get_config, get_http_client, summarize_requests, track_requests
+warnings.filterwarnings("ignore", category=LangChainDeprecationWarning)  # The agent may be built while the prompt is on screen
 
 # --- The Definitive Monkey-Patch ---
+# Applied when the first agent is built rather than at import time, so importing
+# this module has no side effects on the openai package.
 import openai
 original_create = openai.resources.chat.completions.Completions.create
 def patched_create(*args, **kwargs):
     if "stop" in kwargs:
         kwargs["stop"] = []
     return original_create(*args, **kwargs)
-openai.resources.chat.completions.Completions.create = patched_create
+
+def _patch_openai_stop():
+    openai.resources.chat.completions.Completions.create = patched_create
 # --- End of the Definitive Monkey-Patch ---
 
 # Custom file tools (replacing Composio's FILETOOL)
@@ -40,23 +72,30 @@ def list_files() -> str:
         return json.dumps({"error": f"Error listing files: {str(e)}"})
 
 @tool
-def read_file(file_path: str) -> str:
-    """Reads the content of a specified file from the local filesystem.
+def read_file(file_path: str, start_line: int = 1, end_line: Optional[int] = None, byte_offset: Optional[int] = None,
+              byte_length: Optional[int] = None, max_bytes: int = DEFAULT_MAX_BYTES) -> str:
+    """Reads a window of a file from the local filesystem, so large files can be paged through.
     This tool is useful for inspecting the contents of text-based files.
 
     Args:
         file_path (str): The path to the file to read. This should be a relative path
                          from the current working directory.
+        start_line (int, optional): First line to return, 1-based. Defaults to 1.
+        end_line (int, optional): Last line to return, inclusive. Defaults to the end of the file.
+        byte_offset (int, optional): Read a byte range starting here instead of a line range.
+        byte_length (int, optional): Length of the byte range. Defaults to `max_bytes`.
+        max_bytes (int, optional): Upper bound on the returned content. Defaults to 100000.
 
     Returns:
-        str: A JSON string containing the content of the file.
-             Example: `{"content": "This is the content of the file."}`
+        str: A JSON string containing the requested window and metadata about the file.
+             Example: `{"content": "...", "start_line": 1, "end_line": 120, "total_lines": 5000,
+             "total_bytes": 180000, "truncated": false, "next_start_line": 121}`
+             `truncated` is true when `max_bytes` cut the window short; `next_start_line` /
+             `next_byte_offset` say where to continue when the file has more content.
              Returns an error message if the file cannot be read (e.g., file not found, permissions issues).
     """
     try:
-        with open(file_path, 'r') as f:
-            content = f.read()
-        return json.dumps({"content": content})
+        return json.dumps(read_window(file_path, start_line, end_line, byte_offset, byte_length, max_bytes))
     except Exception as e:
         return json.dumps({"error": f"Error reading file '{file_path}': {str(e)}"})
 
@@ -82,9 +121,7 @@ def edit_file(file_path: str, old_text: str = "", new_text: str = "") -> str:
         if not os.path.exists(file_path):
             return json.dumps({"error": f"Error: File '{file_path}' does not exist."})
         
-        original_content = ""
-        with open(file_path, 'r') as f:
-            original_content = f.read()
+        original_content = read_text(file_path)
 
         new_content = original_content
         operation = "none"
@@ -103,8 +140,7 @@ def edit_file(file_path: str, old_text: str = "", new_text: str = "") -> str:
         else:
             return json.dumps({"error": "Error: Must provide either old_text or new_text (or both)."})
 
-        with open(file_path, 'w') as f:
-            f.write(new_content)
+        write_text(file_path, new_content)  # Atomic, and keeps the verify read in memory
             
         return json.dumps({
             "status": "success",
@@ -117,27 +153,268 @@ def edit_file(file_path: str, old_text: str = "", new_text: str = "") -> str:
     except Exception as e:
         return json.dumps({"error": f"Error editing file '{file_path}': {str(e)} (Check permissions or path)."})
 
-# Custom token counter
-def get_grok_num_tokens(messages, model="grok-4-0709"):
-    encoding = tiktoken.encoding_for_model("gpt-4")  # Proxy
-    num_tokens = 0
-    for message in messages:
-        num_tokens += 4  # Overhead
-        for key, value in message.items():
-            num_tokens += len(encoding.encode(value))
-            if key == "name":
-                num_tokens += -1
-    num_tokens += 2  # Response priming
-    return num_tokens
+@tool
+def apply_patch(patch: str) -> str:
+    """Applies a unified diff that may change many places in many files, in one call.
+    Prefer this over repeated `edit_file` calls for multi-line or multi-file changes.
+
+    Args:
+        patch (str): A unified diff as produced by `diff -u` / `git diff`: for each file a
+                     `--- a/path` and `+++ b/path` header followed by `@@ -start,len +start,len @@`
+                     hunks with ` ` context, `-` removed and `+` added lines. Use `/dev/null`
+                     as the old path to create a file and as the new path to delete one,
+                     and a different new path to rename one.
+                     Give 2-3 lines of context per hunk; small line-number or whitespace
+                     differences are tolerated.
+
+    Returns:
+        str: A JSON string with a status per file and hunk and a change summary.
+             Example: `{"status": "success", "files": [{"path": "a.py", "operation": "modify", "added": 3,
+             "removed": 1, "hunks": [{"hunk": 1, "header": "@@ -10,4 +10,6 @@", "status": "applied", "line": 12,
+             "offset": 2}]}], "summary": "1 file(s) changed, 3 insertion(s)(+), 1 deletion(s)(-)"}`
+             If any hunk fails, no file is changed and an error is returned with the failed hunks.
+    """
+    try:
+        return json.dumps(apply_unified_diff(patch))
+    except Exception as e:
+        return json.dumps({"error": f"Error applying patch: {str(e)}"})
+
+@tool
+def run_command(command: str, timeout_seconds: int = DEFAULT_TIMEOUT_SECONDS, cwd: str = "") -> str:
+    """Runs a shell command (tests, builds, linters, git, ...) and returns its exit code and output.
+    A command runs after the edits requested before it in the same step; independent commands
+    requested in the same step run concurrently.
+
+    Args:
+        command (str): The command line, run by the system shell in the current working directory.
+                       It gets no stdin, so pass flags that avoid interactive prompts.
+                       Anything it starts in the background is stopped when it exits.
+        timeout_seconds (int, optional): Wall-clock limit; the command is killed when it is exceeded.
+                                         Defaults to 120, at most 1800.
+        cwd (str, optional): Directory to run in, relative to the current working directory.
+
+    Returns:
+        str: A JSON string with the exit code, duration and combined stdout/stderr.
+             Example: `{"command": "pytest -q", "exit_code": 1, "duration_s": 4.2, "timed_out": false,
+             "output": "...", "truncated": true, "output_chars": 250000, "output_lines": 4100}`
+             Long output keeps its first and last parts with a `... [N lines omitted] ...` marker
+             (`truncated` is true). `exit_code` is null when the command timed out.
+             Returns an error message if the command cannot be started.
+    """
+    try:
+        return json.dumps(asyncio.run(run_shell_command(command, cwd, timeout_seconds)))
+    except Exception as e:
+        return json.dumps({"error": f"Error running '{command}': {str(e)}"})
+
+async def _arun_command(command: str, timeout_seconds: int = DEFAULT_TIMEOUT_SECONDS, cwd: str = "") -> str:
+    async def on_output(text):
+        try:
+            # Surfaces as an "on_custom_event" in astream_events, i.e. live in the terminal
+            await adispatch_custom_event("command_output", {"command": command, "text": text})
+        except RuntimeError:
+            pass  # Not running inside an agent turn
+    try:
+        return json.dumps(await run_shell_command(command, cwd, timeout_seconds, on_output))
+    except Exception as e:
+        return json.dumps({"error": f"Error running '{command}': {str(e)}"})
+
+run_command.coroutine = _arun_command
+
+@tool
+def glob_files(pattern: str = "**/*", max_results: int = 500) -> str:
+    """Recursively lists files in the workspace whose path matches a glob pattern, honoring .gitignore.
+    Backed by a persistent index, so this is the fastest way to find files anywhere in the project.
+
+    Args:
+        pattern (str, optional): Glob matched against paths relative to the current working directory.
+                                 Without a `/` it matches file names at any depth (e.g. `*.py`);
+                                 `**` spans directories (e.g. `src/**/test_*.py`). Defaults to all files.
+        max_results (int, optional): Maximum number of paths to return. Defaults to 500.
+
+    Returns:
+        str: A JSON string containing the matching paths.
+             Example: `{"files": ["grok_cli/agent.py", "grok_cli/cli.py"], "total": 2, "truncated": false}`
+             Returns an error message if the workspace cannot be indexed.
+    """
+    try:
+        return json.dumps(get_index().glob(pattern, max_results))
+    except Exception as e:
+        return json.dumps({"error": f"Error listing files matching '{pattern}': {str(e)}"})
+
+@tool
+def search_files(query: str, glob: str = "", regex: bool = False, case_sensitive: bool = True, max_results: int = 100) -> str:
+    """Searches the contents of all workspace files (honoring .gitignore) and returns matching lines.
+    Backed by a trigram index, so locating a symbol or string takes a single call.
+
+    Args:
+        query (str): Text to search for, or a Python regular expression if `regex` is true.
+        glob (str, optional): Only search files matching this glob (same rules as `glob_files`).
+        regex (bool, optional): Treat `query` as a regular expression. Defaults to False.
+        case_sensitive (bool, optional): Defaults to True.
+        max_results (int, optional): Maximum number of matching lines to return. Defaults to 100.
+
+    Returns:
+        str: A JSON string containing the matches.
+             Example: `{"matches": [{"path": "grok_cli/cli.py", "line": 12, "text": "def main():"}], "truncated": false}`
+             Returns an error message if the query is invalid or the workspace cannot be indexed.
+    """
+    try:
+        return json.dumps(get_index().search(query, glob or None, regex, case_sensitive, max_results))
+    except Exception as e:
+        return json.dumps({"error": f"Error searching for '{query}': {str(e)}"})
+
+# Async variants of the file tools. AgentExecutor gathers the tool calls of one step
+# concurrently on its async path; the blocking file I/O runs on a small bounded pool.
+_TOOL_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="grok-tool")
+
+def _in_tool_pool(func):
+    async def run(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(_TOOL_POOL, functools.partial(ctx.run, func, *args, **kwargs))
+    return run
+
+for _file_tool in (list_files, read_file, edit_file, apply_patch, glob_files, search_files):
+    _file_tool.coroutine = _in_tool_pool(_file_tool.func)
+
+# event loop -> {"paths": {real path: future resolved when the last queued call on that path
+# finishes}, "writes": futures of edits in flight, "commands": futures of commands in flight}
+_in_flight = weakref.WeakKeyDictionary()
+_WRITE_TOOLS = frozenset({"edit_file", "apply_patch"})
+
+def _tool_paths(agent_action):
+    tool_input = agent_action.tool_input
+    if isinstance(tool_input, dict) and isinstance(tool_input.get("file_path"), str):
+        return [tool_input["file_path"]]
+    if isinstance(tool_input, dict) and isinstance(tool_input.get("patch"), str):
+        return patch_paths(tool_input["patch"])
+    return []
+
+class ConcurrentAgentExecutor(AgentExecutor):
+    """AgentExecutor whose async path keeps calls on the same file in the order the model issued them.
+
+    The base class already runs the actions of one step with `asyncio.gather`. Here each action
+    queues behind earlier actions on the same path before its first await, so gather's scheduling
+    order (the model's order) decides who goes first; unrelated calls still run side by side.
+    A `run_command` may touch any file, so it waits for the edits issued before it and the file
+    calls issued after it wait for it; commands still run alongside each other.
+    """
+
+    async def _aperform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None):
+        loop = asyncio.get_running_loop()
+        state = _in_flight.setdefault(loop, {"paths": {}, "writes": set(), "commands": set()})
+        tails = state["paths"]
+        done = loop.create_future()
+        keys = set()
+        if agent_action.tool == "run_command":
+            previous = set(state["writes"])
+            state["commands"].add(done)
+        else:
+            keys = {os.path.realpath(p) for p in _tool_paths(agent_action)}
+            previous = {tails[key] for key in keys if key in tails} | state["commands"]
+            for key in keys:
+                tails[key] = done
+            if agent_action.tool in _WRITE_TOOLS:
+                state["writes"].add(done)
+        try:
+            if previous:
+                await asyncio.wait(previous)
+            return await super()._aperform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager)
+        finally:
+            done.set_result(None)
+            state["writes"].discard(done)
+            state["commands"].discard(done)
+            for key in keys:
+                if tails.get(key) is done:
+                    del tails[key]
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop():
+    """Returns the event loop shared by `stream_chat` turns, starting its thread on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="grok-agent-loop", daemon=True).start()
+        return _loop
+
+def _tool_error(tool_output):
+    """Returns the "error" of a tool's JSON output, or None if it did not fail."""
+    try:
+        output_dict = json.loads(tool_output)
+    except (json.JSONDecodeError, TypeError):
+        return None
+    return output_dict["error"] if isinstance(output_dict, dict) and "error" in output_dict else None
+
+
+class TraceCallbackHandler(BaseCallbackHandler):
+    """Records each LLM call (with time to first token) and tool call (with bytes in/out) on a turn trace."""
+
+    run_inline = True  # Timestamps are taken where the events happen, not in an executor
+
+    def __init__(self, trace):
+        self.trace = trace
+        self._runs = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        model = (metadata or {}).get("ls_model_name") or "llm"
+        self._runs[run_id] = {"start": time.perf_counter(), "first_token": None, "name": model}
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        run = self._runs.get(run_id)
+        if run is not None and run["first_token"] is None:
+            run["first_token"] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        generation = response.generations[0][0] if response.generations and response.generations[0] else None
+        usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+        total_tokens = usage.get("total_tokens") or (response.llm_output or {}).get("token_usage", {}).get("total_tokens")
+        ttft = run["first_token"] - run["start"] if run["first_token"] is not None else None
+        self.trace.add(run["name"], "llm", run["start"], time.perf_counter(), model=run["name"],
+                       ttft_s=ttft, total_tokens=total_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            self.trace.add(run["name"], "llm", run["start"], time.perf_counter(), model=run["name"], error=str(error))
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._runs[run_id] = {"start": time.perf_counter(), "name": (serialized or {}).get("name") or "tool",
+                              "bytes_in": len(str(input_str).encode("utf-8", "replace"))}
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        output = getattr(output, "content", output)
+        output = output if isinstance(output, str) else str(output)
+        self.trace.add(run["name"], "tool", run["start"], time.perf_counter(), bytes_in=run["bytes_in"],
+                       bytes_out=len(output.encode("utf-8", "replace")))
+        error = _tool_error(output)
+        if error is not None:
+            self.trace.errors.append(f"{run['name']}: {error}")
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            self.trace.add(run["name"], "tool", run["start"], time.perf_counter(), bytes_in=run["bytes_in"], error=str(error))
+            self.trace.errors.append(f"{run['name']}: {error}")
 
 # Custom LLM subclass
 class CustomChatOpenAI(ChatOpenAI):
     def get_num_tokens_from_messages(self, messages: List[BaseMessage]) -> int:
-        converted_messages = [{"role": msg.type, "content": msg.content if isinstance(msg.content, str) else str(msg.content)} for msg in messages]
-        return get_grok_num_tokens(converted_messages)
+        return get_grok_num_tokens([to_message_dict(msg) for msg in messages])
 
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 
+DEFAULT_FAST_MODEL = "grok-3-mini"
+
 # Tool calling prompt (trimmed for efficiency)
 prompt = ChatPromptTemplate.from_messages(
     [
@@ -147,13 +424,15 @@ Your primary goal is to help the user by safely and efficiently modifying files
 **Core Mandates:**
 - Analyze request and context using tools.
 - Plan step-by-step; share for complex changes.
-- Implement with `edit_file`.
-- Verify with `read_file`; retry if needed.
+- Implement with `edit_file`, or `apply_patch` for larger or multi-file changes.
+- Verify with `read_file`, and run tests or builds with `run_command`; retry if needed.
 - Persist until resolved; handle errors by retrying.
 - Be concise; focus on results.
 
 **Tool Usage:**
-- Use `list_files`, `read_file`, `edit_file` for filesystem.
+- Use `list_files`, `read_file`, `edit_file`, `apply_patch` for filesystem.
+- Locate code with `glob_files` (paths) and `search_files` (contents) in one call; `list_files` only shows the top level.
+- `read_file` returns a window; page large files with `start_line`/`end_line`.
 - Precise args; `old_text` with context.
 
 **Modification Workflow:**
@@ -167,7 +446,7 @@ Your primary goal is to help the user by safely and efficiently modifying files
 - Do not finish prematurely.
 
 **Current Context:**
-- CLI with filesystem tools.
+- CLI with filesystem and shell tools.
 
 Proceed with request."""),
         MessagesPlaceholder("chat_history", optional=True),
@@ -177,23 +456,58 @@ Proceed with request."""),
 )
 
 class GrokAgent:
-    def __init__(self, api_key, model="grok-4-0709", base_url="https://api.x.ai/v1", summarize_memory=True):  # Default to True
-        self.llm = CustomChatOpenAI(
-            api_key=api_key,
-            model=model,
-            base_url=base_url,
-            temperature=0.0,
-            max_tokens=4096,  # Reduced for efficiency
-        )
+    def __init__(self, api_key, model="grok-4-0709", base_url="https://api.x.ai/v1", summarize_memory=True,  # Default to True
+                 scratchpad_token_budget=DEFAULT_SCRATCHPAD_TOKEN_BUDGET, fast_model=None, routing=True,
+                 cache_responses=False, cache_ttl=DEFAULT_TTL_SECONDS, http_client=None, http_async_client=None,
+                 session=None, max_prompt_tokens=None):
+        _patch_openai_stop()
+        # All agents share one keep-alive connection pool that retries 429/5xx itself,
+        # so the SDK's own retries are off unless the caller brings its own clients.
+        shared_clients = http_client is None and http_async_client is None
+        http_client = http_client or get_http_client()
+        http_async_client = http_async_client or get_async_http_client()
+        max_retries = 0 if shared_clients else 2
+        # The SDK overrides the client's timeout with its own (None: wait forever) on every request
+        request_timeout = get_config().timeout() if shared_clients else http_client.timeout
+        # Opt-in: replays identical temperature=0 calls from disk. Cached calls cannot stream,
+        # so streaming is turned off while the cache is on.
+        self.response_cache = ResponseCache(namespace=base_url, ttl_seconds=cache_ttl) if cache_responses else None
+        self.model_usage = ModelUsage()  # Calls, latency and tokens per model, for the status bar
+
+        def make_llm(model_name):
+            return CustomChatOpenAI(
+                api_key=api_key,
+                model=model_name,
+                base_url=base_url,
+                temperature=0.0,
+                max_tokens=4096,  # Reduced for efficiency
+                stream_usage=True,  # Custom base_url disables this by default; needed for streamed token accounting
+                cache=self.response_cache,
+                disable_streaming=cache_responses,
+                http_client=http_client,
+                http_async_client=http_async_client,
+                max_retries=max_retries,
+                timeout=request_timeout,
+                callbacks=[self.model_usage],
+            )
+
+        self.llm = make_llm(model)
         self.model = model  # Add this
+        # A smaller, faster model writes summaries and answers simple follow-ups
+        self.fast_model = fast_model or (DEFAULT_FAST_MODEL if model.startswith("grok") else model)
+        self.fast_llm = self.llm if self.fast_model == model else make_llm(self.fast_model)
         
-        self.tools = [list_files, read_file, edit_file]
+        self.tools = [list_files, read_file, edit_file, apply_patch, glob_files, search_files, run_command]
         
-        self.context_window = 256000 if "grok-4" in model else 16384  # Accurate for Grok-4
+        # Keeps every request within the model's context window (or max_prompt_tokens)
+        self.context_budget = ContextBudget(model, tools=self.tools, max_output_tokens=self.llm.max_tokens,
+                                            max_prompt_tokens=max_prompt_tokens)
+        self.context_window = self.context_budget.context_window
         
         if summarize_memory:
-            self.memory = ConversationSummaryBufferMemory(
-                llm=self.llm,  # Use subclass, no bind
+            # Summaries are written in the background by the fast model
+            self.memory = BackgroundSummaryBufferMemory(
+                llm=self.fast_llm,  # Use subclass, no bind
                 memory_key="chat_history",
                 return_messages=True,
                 input_key="input",
@@ -207,14 +521,26 @@ class GrokAgent:
                 input_key="input"
             )
         
-        # Create tool calling agent
-        self.agent = create_tool_calling_agent(
-            llm=self.llm,
-            tools=self.tools,
-            prompt=prompt
+        # Optional sessions.SessionStore: restores the memory now and saves it after every turn
+        self.session = session
+        self.restored_messages = session.restore(self.memory) if session is not None else 0
+
+        # Deduplicates and, over budget, shrinks tool outputs resent on each iteration
+        self.compactor = ScratchpadCompactor(token_budget=scratchpad_token_budget)
+
+        # Sends simple follow-ups to the fast model and planning and edits to the main one
+        self.router = ModelRouter(self.llm, self.fast_llm, self.tools, enabled=routing)
+
+        # Tool calling agent, as create_tool_calling_agent builds it plus the budget and routing steps
+        self.agent = (
+            RunnablePassthrough.assign(agent_scratchpad=lambda x: self.compactor(x["intermediate_steps"]))
+            | prompt
+            | RunnableLambda(self.context_budget, name="fit_context")
+            | RunnableLambda(self.router.invoke, afunc=self.router.ainvoke, name="route_model")
+            | ToolsAgentOutputParser()
         )
         
-        self.executor = AgentExecutor(
+        self.executor = ConcurrentAgentExecutor(
             agent=self.agent,
             tools=self.tools,
             memory=self.memory,
@@ -225,33 +551,156 @@ class GrokAgent:
             return_intermediate_steps=True
         )
 
-        self.last_token_usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        self.last_token_usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "scratchpad_tokens_saved": 0,
+                                 "context_tokens_trimmed": 0}
         self.last_error_count = 0
+        self.last_turn_seconds = 0.0
+        self.last_request_stats = summarize_requests([])
+        self.last_trace = None  # TurnTrace of the latest turn: LLM/tool timings and errors
+        self._fixed_prompt_tokens = None
+
+    def next_prompt_tokens(self):
+        """Estimates the prompt tokens of the next turn's first LLM call: system prompt, tool schemas and history.
+
+        Per-message counts are cached, so only messages added since the last call are encoded.
+        """
+        if self._fixed_prompt_tokens is None:
+            system = {"role": "system", "content": prompt.messages[0].prompt.template}
+            self._fixed_prompt_tokens = count_message_tokens(system) + self.context_budget.overhead_tokens
+        history = self.memory.load_memory_variables({})[self.memory.memory_key]
+        return self._fixed_prompt_tokens + sum(count_message_tokens(to_message_dict(message)) for message in history)
+
+    @contextlib.contextmanager
+    def _turn(self, user_message):
+        """Resets per-turn stats and traces the turn. Yields the run config carrying the trace callbacks."""
+        self.compactor.saved_tokens = 0
+        self.context_budget.trimmed_tokens = 0
+        self.router.turn_routes = []
+        trace = self.last_trace = TurnTrace(user_message)
+        with track_requests() as request_log, use_trace(trace):
+            try:
+                yield {"callbacks": [TraceCallbackHandler(trace)]}
+            except Exception as e:
+                trace.errors.append(f"{type(e).__name__}: {e}")
+                raise
+            finally:
+                trace.finish()
+                self.last_turn_seconds = trace.seconds
+                self.last_request_stats = summarize_requests(request_log)
+                self.save_session()
+
+    def save_session(self):
+        """Appends the memory's changes to the session file, if there is a session."""
+        if self.session is None:
+            return
+        try:
+            self.session.save_turn(self.memory)
+        except OSError as e:
+            if self.last_trace is not None:
+                self.last_trace.errors.append(f"session: {e}")
+
+    def _record_usage(self, cb):
+        self.last_token_usage = {
+            "prompt_tokens": cb.prompt_tokens,
+            "completion_tokens": cb.completion_tokens,
+            "total_tokens": cb.total_tokens,
+            "scratchpad_tokens_saved": self.compactor.saved_tokens,
+            "context_tokens_trimmed": self.context_budget.trimmed_tokens
+        }
+
+    @staticmethod
+    def _is_error_output(tool_output):
+        return _tool_error(tool_output) is not None
+
+    def _finish_turn(self, response, cb):
+        self._record_usage(cb)
+        self.last_error_count = sum(
+            1 for step in response.get("intermediate_steps", []) if self._is_error_output(step[1])
+        )
+        return response["output"]
+
+    def invoke(self, user_message):
+        """Runs one turn like `chat`, but lets API and agent errors (e.g. rate limits) propagate."""
+        with self._turn(user_message) as config, get_openai_callback() as cb:
+            response = self.executor.invoke({"input": user_message}, config=config)
+            return self._finish_turn(response, cb)
 
     def chat(self, user_message):
         try:
-            with get_openai_callback() as cb:
-                response = self.executor.invoke({"input": user_message})
-                
-                self.last_token_usage = {
-                    "prompt_tokens": cb.prompt_tokens,
-                    "completion_tokens": cb.completion_tokens,
-                    "total_tokens": cb.total_tokens
-                }
-                
+            return self.invoke(user_message)
+        except Exception as e:
+            self.last_error_count += 1
+            return f"An error occurred: {str(e)}. Check file permissions or path."
+
+    async def achat(self, user_message):
+        """Async counterpart of `chat`. Independent tool calls within a step run concurrently."""
+        try:
+            with self._turn(user_message) as config, get_openai_callback() as cb:
+                response = await self.executor.ainvoke({"input": user_message}, config=config)
+                return self._finish_turn(response, cb)
+        except Exception as e:
+            self.last_error_count += 1
+            return f"An error occurred: {str(e)}. Check file permissions or path."
+
+    async def astream_chat(self, user_message):
+        """Runs one turn and yields events as they happen instead of waiting for the whole tool loop.
+
+        Yields dicts with a "type" key:
+            - "token": `{"type": "token", "text": str}` for each model text delta.
+            - "tool_start": `{"type": "tool_start", "name": str, "input": dict}` when a tool is invoked.
+            - "tool_output": `{"type": "tool_output", "name": str, "command": str, "text": str}` with
+              output of a running `run_command`, whole lines at a time.
+            - "tool_end": `{"type": "tool_end", "name": str, "output": str}` when a tool returns.
+            - "done": `{"type": "done", "output": str}` once, last, with the final answer.
+        """
+        output = ""
+        try:
+            with self._turn(user_message) as config, get_openai_callback() as cb:
                 error_count = 0
-                for step in response.get("intermediate_steps", []):
-                    tool_output = step[1]
-                    try:
-                        output_dict = json.loads(tool_output)
-                        if "error" in output_dict:
+                async for event in self.executor.astream_events({"input": user_message}, config=config, version="v2"):
+                    kind = event["event"]
+                    if kind == "on_chat_model_stream":
+                        content = event["data"]["chunk"].content
+                        if isinstance(content, str) and content:
+                            yield {"type": "token", "text": content}
+                    elif kind == "on_tool_start":
+                        yield {"type": "tool_start", "name": event["name"], "input": event["data"].get("input", {})}
+                    elif kind == "on_custom_event" and event["name"] == "command_output":
+                        yield {"type": "tool_output", "name": "run_command", **event["data"]}
+                    elif kind == "on_tool_end":
+                        tool_output = event["data"].get("output", "")
+                        tool_output = getattr(tool_output, "content", tool_output)
+                        if not isinstance(tool_output, str):
+                            tool_output = str(tool_output)
+                        if self._is_error_output(tool_output):
                             error_count += 1
-                    except json.JSONDecodeError:
-                        pass
-                
+                        yield {"type": "tool_end", "name": event["name"], "output": tool_output}
+                    elif kind == "on_chain_end" and not event.get("parent_ids"):
+                        output = event["data"]["output"]["output"]
+
+                self._record_usage(cb)
                 self.last_error_count = error_count
-                
-            return response["output"]
         except Exception as e:
             self.last_error_count += 1
-            return f"An error occurred: {str(e)}. Check file permissions or path."
\ No newline at end of file
+            output = f"An error occurred: {str(e)}. Check file permissions or path."
+        yield {"type": "done", "output": output}
+
+    def stream_chat(self, user_message):
+        """Synchronous wrapper around `astream_chat` for the terminal loop.
+
+        Turns run on a long-lived event loop thread so the caller can render each event
+        as soon as it is produced, and pooled connections stay open between turns.
+        """
+        events = queue.Queue()
+
+        async def pump():
+            try:
+                async for event in self.astream_chat(user_message):
+                    events.put(event)
+            finally:
+                events.put(None)
+
+        turn = asyncio.run_coroutine_threadsafe(pump(), _background_loop())
+        while (event := events.get()) is not None:
+            yield event
+        turn.result()
@@ -0,0 +1,168 @@
+"""Headless batch mode: runs a JSONL file of prompts across a pool of workers.
+
+Each prompt gets its own GrokAgent (and so its own memory); the shared HTTP connection
+pool (see `transport`) and the tokenizer are used by all of them. Results are appended to
+an output JSONL file as they complete, one object per prompt with its latency, token
+usage, API request and error counts. Concurrency is adaptive: every 429 the pool retries
+halves the number of prompts allowed in flight, a prompt still rate-limited after those
+retries is re-run after a backoff (or failed, if it already ran tools that a rerun would
+repeat), and the limit grows back one step per success.
+"""
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import openai
+
+from .agent import GrokAgent
+from .transport import add_retry_listener, configure, remove_retry_listener, summarize_requests
+
+DEFAULT_WORKERS = 4
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 2.0
+
+
+def load_requests(input_path):
+    """Reads prompts from a JSONL file.
+
+    Each line is an object with a `prompt` (or a `title` and/or `body`) and an optional
+    `id` / `request_id`; the line number is used when no id is given.
+
+    Raises:
+        ValueError: If a line is not valid JSON or has no prompt.
+    """
+    requests = []
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{input_path}:{line_number}: invalid JSON ({e})") from e
+            prompt = record.get("prompt") or "\n\n".join(
+                part for part in (record.get("title"), record.get("body")) if part
+            )
+            if not prompt:
+                raise ValueError(f"{input_path}:{line_number}: no 'prompt', 'title' or 'body'")
+            request_id = record.get("id") or record.get("request_id") or str(line_number)
+            requests.append({"index": len(requests), "id": request_id, "prompt": prompt})
+    return requests
+
+
+class AdaptiveLimiter:
+    """Caps the number of prompts in flight; halves the cap on rate limits, regrows it on success."""
+
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self._active = 0
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        with self._condition:
+            self._condition.wait_for(lambda: self._active < self.limit)
+            self._active += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def on_rate_limit(self):
+        with self._condition:
+            self.limit = max(1, self.limit // 2)
+
+    def on_success(self):
+        with self._condition:
+            if self.limit < self.max_concurrency:
+                self.limit += 1
+                self._condition.notify_all()
+
+
+def _tools_ran(agent):
+    trace = agent.last_trace
+    return trace is not None and any(span["cat"] == "tool" for span in trace.snapshot())
+
+
+def _run_one(request, agent_kwargs, limiter):
+    attempts = 0
+    while True:
+        attempts += 1
+        agent = None
+        started = time.perf_counter()
+        try:
+            agent = GrokAgent(**agent_kwargs)
+            with limiter:
+                output = agent.invoke(request["prompt"])
+        except openai.RateLimitError as e:
+            limiter.on_rate_limit()
+            # A rerun would repeat the failed attempt's edits and commands
+            if _tools_ran(agent):
+                return _result(request, agent, started, attempts, error=f"Rate limited after tools ran: {e}")
+            if attempts >= MAX_ATTEMPTS:
+                return _result(request, agent, started, attempts, error=f"Rate limited: {e}")
+            time.sleep(BACKOFF_SECONDS * 2 ** (attempts - 1) * random.uniform(0.5, 1.5))
+            continue
+        except Exception as e:
+            return _result(request, agent, started, attempts, error=f"{type(e).__name__}: {e}")
+        limiter.on_success()
+        return _result(request, agent, started, attempts, output=output)
+
+
+def _result(request, agent, started, attempts, output=None, error=None):
+    return {
+        "index": request["index"],
+        "id": request["id"],
+        "output": output,
+        "error": error,
+        "latency_s": round(time.perf_counter() - started, 3),
+        "attempts": attempts,
+        "token_usage": agent.last_token_usage if agent is not None else {},
+        "tool_error_count": agent.last_error_count if agent is not None else 0,
+        "http": agent.last_request_stats if agent is not None else summarize_requests([]),
+    }
+
+
+def run_batch(input_path, output_path, agent_kwargs, workers=DEFAULT_WORKERS, http_settings=None):
+    """Runs every prompt in `input_path` and appends one JSON result per line to `output_path`.
+
+    Args:
+        http_settings (dict): Optional `transport.HttpConfig` overrides for the shared pool.
+
+    Returns:
+        dict: Totals for the run: prompts, failures, tool errors, tokens, API requests and retries, and wall time.
+    """
+    requests = load_requests(input_path)
+    limiter = AdaptiveLimiter(workers)
+    # Two connections per worker: one for the agent, one for a background summary
+    configure(**dict({"max_connections": max(32, workers * 2), "max_keepalive_connections": workers * 2},
+                     **(http_settings or {})))
+
+    def on_retry(status):
+        if status == 429:
+            limiter.on_rate_limit()
+
+    started = time.perf_counter()
+    totals = {"prompts": len(requests), "failed": 0, "tool_errors": 0, "total_tokens": 0, "http_requests": 0, "http_retries": 0}
+    add_retry_listener(on_retry)
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="grok-batch") as pool, \
+                open(output_path, "a", encoding="utf-8") as out:
+            futures = [pool.submit(_run_one, request, agent_kwargs, limiter) for request in requests]
+            for future in as_completed(futures):
+                result = future.result()
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+                totals["failed"] += result["error"] is not None
+                totals["tool_errors"] += result["tool_error_count"]
+                totals["total_tokens"] += result["token_usage"].get("total_tokens", 0)
+                totals["http_requests"] += result["http"]["requests"]
+                totals["http_retries"] += result["http"]["retries"]
+    finally:
+        remove_retry_listener(on_retry)
+    totals["wall_s"] = round(time.perf_counter() - started, 3)
+    return totals
@@ -1,8 +1,12 @@
 import click
 import os
-import subprocess
+import shutil
 import sys
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .status import display_cwd, git_branch
 
 try:
     import termios
@@ -23,8 +27,12 @@ def _getch():
         termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
         return ch
 
-def custom_prompt():
-    """Custom input prompt that handles keyboard shortcuts like ctrl+o and ctrl+t."""
+def custom_prompt(details=None):
+    """Custom input prompt that handles keyboard shortcuts like ctrl+o, ctrl+e and ctrl+t.
+
+    Args:
+        details (callable): Returns the text ctrl+o shows (the latest turn's timings and errors).
+    """
     line = ""
     sys.stdout.write("  > ")
     sys.stdout.flush()
@@ -39,7 +47,12 @@ def custom_prompt():
                 sys.stdout.write('\b \b')
                 sys.stdout.flush()
         elif ch == '\x0f':  # Ctrl+O (ASCII 15)
-            print("\nNo errors to display.")  # Placeholder for error details
+            print("\n" + (details() if details else "No errors to display."))
+            sys.stdout.write("  > " + line)
+            sys.stdout.flush()
+        elif ch == '\x05':  # Ctrl+E (ASCII 5)
+            print()
+            show_full_output()
             sys.stdout.write("  > " + line)
             sys.stdout.flush()
         elif ch == '\x14':  # Ctrl+T (ASCII 20)
@@ -51,7 +64,26 @@ def custom_prompt():
             sys.stdout.write(ch)
             sys.stdout.flush()
 
-from .agent import GrokAgent
+def start_agent(http_settings=None, **agent_kwargs):
+    """Builds the GrokAgent on a background thread and returns a future for it.
+
+    `grok_cli.agent` pulls in langchain, langchain_openai, tiktoken and openai, which
+    dominate startup. Importing it here, off the main thread, lets the banner and the
+    first prompt appear while those load; `--help` and argument validation never
+    reach this point. `http_settings` overrides the shared connection pool's timeouts
+    and retries (see `grok_cli.transport.HttpConfig`).
+    """
+    def build():
+        from .agent import GrokAgent
+        if http_settings:
+            from .transport import configure
+            configure(**http_settings)
+        return GrokAgent(**agent_kwargs)
+
+    loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="grok-agent-loader")
+    future = loader.submit(build)
+    loader.shutdown(wait=False)
+    return future
 
 def print_grok_art():
     """Prints the bold Grok CLI ASCII art."""
@@ -65,41 +97,63 @@ def print_grok_art():
 """
     click.echo(click.style(art, fg='magenta'))
 
-def print_status_bar(agent=None):
-    """Prints the status bar at the bottom, styled like the Gemini CLI."""
-    # Get current directory and git branch
-    current_dir = os.getcwd().replace(os.path.expanduser("~"), "~")
-    try:
-        git_branch_raw = subprocess.check_output(
-            ['git', 'rev-parse', '--abbrev-ref', 'HEAD'], 
-            stderr=subprocess.DEVNULL
-        ).decode('utf-8').strip()
-        git_branch = f"({git_branch_raw})"
-    except subprocess.CalledProcessError:
-        git_branch = ""
+def status_line(agent=None):
+    """Builds the status bar text, styled like the Gemini CLI."""
+    # Current directory and git branch (read from .git/HEAD, cached on its mtime)
+    current_dir = display_cwd()
+    branch = git_branch()
+    git_branch_info = f"({branch})" if branch else ""
 
     # --- Grok-style status elements ---
     sandbox_info = "no sandbox (see /docs)"
     
-    # Context left calculation
+    # Context left: what the next prompt will cost, counted incrementally
     model_name = agent.model if agent else "grok-4"
-    if agent and agent.last_token_usage.get("prompt_tokens", 0) > 0:
-        prompt_used = agent.last_token_usage["prompt_tokens"]
+    if agent:
+        prompt_used = agent.next_prompt_tokens()
         percent_left = max(0, (agent.context_window - prompt_used) / agent.context_window * 100)
         context_left = f"{model_name} ({int(percent_left)}% context left)"
     else:
-        context_left = f"{model_name} (100% context left)"  # Initial or fallback
+        context_left = f"{model_name} (100% context left)"  # Before the agent has loaded
     
     model_info = click.style(context_left, fg="cyan")
+
+    # Turn latency; summarization runs in the background and is reported separately
+    timing_info = ""
+    if agent and agent.response_cache is not None:
+        timing_info += f"   cache {agent.response_cache.hits} hits / {agent.response_cache.misses} misses"
+    if agent and agent.last_turn_seconds:
+        timing_info += f"   turn {agent.last_turn_seconds:.1f}s"
+        summary_seconds = getattr(agent.memory, "last_summary_seconds", 0.0)
+        if summary_seconds:
+            timing_info += f" (summary {summary_seconds:.1f}s in background)"
+    if agent and agent.last_request_stats["requests"]:
+        stats = agent.last_request_stats
+        timing_info += f"   api {stats['requests']} calls, max {stats['max_latency_s']:.1f}s"
+        if stats["retries"]:
+            timing_info += f", {stats['retries']} retried"
+    if agent and agent.router.enabled and agent.router.turn_routes:  # Not with --no-routing or one model
+        fast_calls = sum(1 for route, _ in agent.router.turn_routes if route == "fast")
+        timing_info += f"   routed {fast_calls}/{len(agent.router.turn_routes)} to {agent.fast_model}"
+    if agent:
+        for model, usage in agent.model_usage.snapshot().items():
+            tokens = usage["prompt_tokens"] + usage["completion_tokens"]
+            timing_info += f"   {model}: avg {usage['seconds'] / usage['calls']:.1f}s, {tokens / 1000:.1f}k tok"
+    if agent and agent.last_token_usage.get("context_tokens_trimmed"):
+        timing_info += f"   {agent.last_token_usage['context_tokens_trimmed']} tokens trimmed to fit"
     
     # Error count
     error_count = agent.last_error_count if agent else 0
     errors_info = click.style(f"X {error_count} errors (ctrl+o for details)", fg="red")
 
-    status_line = f"  {current_dir} {git_branch}   {sandbox_info}   {model_info} | {errors_info}"
+    line = f"  {current_dir} {git_branch_info}   {sandbox_info}   {model_info}{timing_info} | {errors_info}"
     
     # The entire status bar is dimmed
-    click.echo(click.style(status_line, dim=True))
+    return click.style(line, dim=True)
+
+def print_status_bar(agent=None):
+    """Prints the status bar at the bottom."""
+    click.echo(status_line(agent))
 
 def display_user_prompt(text):
     """Displays the user's entered prompt inside a styled box."""
@@ -113,123 +167,459 @@ def display_user_prompt(text):
     click.echo("  " + click.style("╰" + "─" * width + "╯", dim=True))
     click.echo()
 
-def display_agent_response(text):
-    """Formats and displays the agent's response based on its content."""
+# Full output of the latest rendered response, for the ctrl+e pager
+_last_full_output = ""
+
+
+def _screen_budget():
+    """Returns (max lines, max characters per line) for one rendered block, from the terminal size."""
+    columns, rows = shutil.get_terminal_size((100, 40))
+    return max(10, rows - 8), max(80, columns) * 2
+
+
+def _clip(line, max_chars):
+    return line if len(line) <= max_chars else line[:max_chars - 1] + "…"
+
+
+def _line_window(text, max_lines):
+    """Splits `text` into its first and last lines around an elided middle.
+
+    Only the lines that are shown get split out (via `str.find`/`rfind`), so the cost
+    does not grow with the number of lines in `text`, beyond one `str.count`.
+
+    Returns:
+        tuple: (head lines, number of elided lines, tail lines).
+    """
+    total = text.count("\n") + 1
+    if total <= max_lines:
+        return text.split("\n"), 0, []
+    head_count = max_lines * 2 // 3
+    tail_count = max_lines - head_count
+    head_end = -1
+    for _ in range(head_count):
+        head_end = text.find("\n", head_end + 1)
+    tail_start = len(text)
+    for _ in range(tail_count):
+        tail_start = text.rfind("\n", 0, tail_start)
+    return text[:head_end].split("\n"), total - head_count - tail_count, text[tail_start + 1:].split("\n")
+
+
+def _list_window(items, max_lines):
+    """Same as `_line_window` for a list of already separate lines."""
+    if len(items) <= max_lines:
+        return items, 0, []
+    head_count = max_lines * 2 // 3
+    tail_count = max_lines - head_count
+    return items[:head_count], len(items) - max_lines, items[len(items) - tail_count:]
+
+
+def _add_window(out, window, render, max_chars, prefix="  " + "│ "):
+    """Appends the head, an elision marker and the tail of `window` to `out`, one rendered line each."""
+    head, elided, tail = window
+    for item in head:
+        out.append(prefix + render(item, max_chars) + "\n")
+    if elided:
+        out.append(prefix + click.style(f"  … {elided} more lines (ctrl+e to page through the full output)", dim=True) + "\n")
+        for item in tail:
+            out.append(prefix + render(item, max_chars) + "\n")
+
+
+def _box_top(out, title):
+    out.append("  " + click.style("╭" + "─" * 50 + "╮", dim=True) + "\n")
+    out.append("  " + "│ " + title + "\n")
+    out.append("  " + "│ " + "\n")
+
+
+def _box_bottom(out):
+    out.append("  " + click.style("╰" + "─" * 50 + "╯", dim=True) + "\n")
+    out.append("\n")
+
+
+def show_full_output():
+    """Opens the full text of the latest response in a pager (ctrl+e)."""
+    if _last_full_output:
+        click.echo_via_pager(_last_full_output)
+    else:
+        click.echo("No output to show.")
+
+
+def _patch_lines(files):
+    """One line per file of an apply_patch result, plus one per hunk that did not apply cleanly."""
+    lines = []
+    for result in files:
+        if "error" in result:
+            lines.append(f"{result['path']}: {result['error']}")
+            continue
+        path = f"{result['renamed_from']} -> {result['path']}" if "renamed_from" in result else result["path"]
+        lines.append(f"{result['operation']} {path}  +{result['added']} -{result['removed']}")
+        for hunk in result["hunks"]:
+            if hunk["status"] != "applied":
+                lines.append(f"  hunk {hunk['hunk']} {hunk['header']}: {hunk.get('reason', hunk['status'])}")
+            elif hunk.get("fuzz") or hunk.get("offset"):
+                notes = [f"offset {hunk['offset']:+d}"] if hunk.get("offset") else []
+                notes += [hunk["fuzz"]] if hunk.get("fuzz") else []
+                lines.append(f"  hunk {hunk['hunk']} at line {hunk['line']}: " + ", ".join(notes))
+    return lines
+
+
+def display_agent_response(text, output_shown=False):
+    """Formats and displays the agent's response based on its content.
+
+    Everything is rendered into one buffer and written at once. Long content is cut to a
+    head and tail window sized to the terminal; ctrl+e pages through the full text.
+
+    Args:
+        output_shown (bool): A `run_command` result whose output was already streamed
+            live; only its status line is shown.
+    """
+    global _last_full_output
+    _last_full_output = text
+    max_lines, max_chars = _screen_budget()
+    out = []
     try:
         # Attempt to parse the text as JSON
         response_json = json.loads(text)
+        if not isinstance(response_json, dict):
+            raise TypeError
 
         if "error" in response_json:
             # Handle structured error messages from tools
-            click.echo("  " + click.style("╭" + "─" * 50 + "╮", dim=True))
-            click.echo("  " + "│ " + click.style("✖ Tool Error", fg='red'))
-            click.echo("  " + "│ ")
-            click.echo("  " + "│ " + click.style(f"  {response_json['error']}", fg='red'))
-            click.echo("  " + click.style("╰" + "─" * 50 + "╯", dim=True))
-            click.echo()
+            _box_top(out, click.style("✖ Tool Error", fg='red'))
+            _add_window(out, _line_window(str(response_json['error']), max_lines),
+                        lambda line, limit: click.style(f"  {_clip(line, limit)}", fg='red'), max_chars)
+            if isinstance(response_json.get("files"), list):
+                # apply_patch: which files and hunks failed
+                _add_window(out, _list_window(_patch_lines(response_json["files"]), max_lines),
+                            lambda line, limit: click.style(f"  {_clip(line, limit)}", fg='yellow'), max_chars)
+            _box_bottom(out)
+        elif "exit_code" in response_json and "output" in response_json:
+            # Handle run_command output
+            _last_full_output = response_json["output"]
+            ok = response_json["exit_code"] == 0
+            _box_top(out, click.style(f"{'✔' if ok else '✖'} $ {_clip(response_json['command'], max_chars - 6)}",
+                                      fg='green' if ok else 'red'))
+            if not output_shown:
+                _add_window(out, _line_window(response_json["output"], max_lines),
+                            lambda line, limit: click.style(f"  {_clip(line, limit)}", fg='yellow'), max_chars)
+            status = (f"  timed out after {response_json['duration_s']:.1f}s" if response_json.get("timed_out")
+                      else f"  exit {response_json['exit_code']} in {response_json['duration_s']:.1f}s")
+            if response_json.get("truncated"):
+                status += f", {response_json['output_lines']} lines (model saw head and tail)"
+            out.append("  " + "│ " + click.style(status, dim=True) + "\n")
+            _box_bottom(out)
+        elif "files" in response_json and "summary" in response_json:
+            # Handle apply_patch output
+            _box_top(out, click.style("✔ Patch Applied", fg='green'))
+            _add_window(out, _list_window(_patch_lines(response_json["files"]), max_lines),
+                        lambda line, limit: click.style(f"  {_clip(line, limit)}", fg='cyan'), max_chars)
+            out.append("  " + "│ " + click.style(f"  {response_json['summary']}", dim=True) + "\n")
+            _box_bottom(out)
         elif "files" in response_json:
             # Handle list_files output
-            click.echo("  " + click.style("╭" + "─" * 50 + "╮", dim=True))
-            click.echo("  " + "│ " + click.style("📁 Files Listed", fg='green'))
-            click.echo("  " + "│ ")
-            for f in response_json["files"]:
-                click.echo("  " + "│ " + click.style(f"  - {f}", fg='cyan'))
-            click.echo("  " + click.style("╰" + "─" * 50 + "╯", dim=True))
-            click.echo()
+            _box_top(out, click.style("📁 Files Listed", fg='green'))
+            _add_window(out, _list_window(response_json["files"], max_lines),
+                        lambda f, limit: click.style(f"  - {_clip(str(f), limit)}", fg='cyan'), max_chars)
+            _box_bottom(out)
+        elif "matches" in response_json:
+            # Handle search_files output
+            _box_top(out, click.style(f"🔎 {len(response_json['matches'])} Matches", fg='green'))
+            _add_window(out, _list_window(response_json["matches"], max_lines),
+                        lambda match, limit: click.style(f"  {match['path']}:{match['line']}", fg='cyan')
+                        + click.style(f"  {_clip(match['text'], limit)}", fg='yellow'), max_chars)
+            _box_bottom(out)
         elif "content" in response_json:
             # Handle read_file output
-            click.echo("  " + click.style("╭" + "─" * 50 + "╮", dim=True))
-            click.echo("  " + "│ " + click.style("📄 File Content", fg='green'))
-            click.echo("  " + "│ ")
-            for line in response_json["content"].split('\n'):
-                click.echo("  " + "│ " + click.style(f"  {line}", fg='yellow'))
-            click.echo("  " + click.style("╰" + "─" * 50 + "╯", dim=True))
-            click.echo()
+            _last_full_output = response_json["content"]
+            _box_top(out, click.style("📄 File Content", fg='green'))
+            _add_window(out, _line_window(response_json["content"], max_lines),
+                        lambda line, limit: click.style(f"  {_clip(line, limit)}", fg='yellow'), max_chars)
+            if "total_lines" in response_json and "start_line" in response_json:
+                window = f"  Lines {response_json['start_line']}-{response_json['end_line']} of {response_json['total_lines']}"
+                if response_json.get("truncated"):
+                    window += " (truncated)"
+                out.append("  " + "│ " + click.style(window, dim=True) + "\n")
+            _box_bottom(out)
         elif "status" in response_json and response_json["status"] == "success":
             # Handle successful edit_file output
-            click.echo("  " + click.style("╭" + "─" * 50 + "╮", dim=True))
-            click.echo("  " + "│ " + click.style("✔ File Edited", fg='green'))
-            click.echo("  " + "│ ")
-            click.echo("  " + "│ " + click.style(f"  Path: {response_json.get('file_path', 'N/A')}", fg='cyan'))
-            click.echo("  " + "│ " + click.style(f"  Operation: {response_json.get('operation', 'N/A')}", fg='cyan'))
-            
+            _box_top(out, click.style("✔ File Edited", fg='green'))
+            out.append("  " + "│ " + click.style(f"  Path: {response_json.get('file_path', 'N/A')}", fg='cyan') + "\n")
+            out.append("  " + "│ " + click.style(f"  Operation: {response_json.get('operation', 'N/A')}", fg='cyan') + "\n")
+
             old_snippet = response_json.get('old_content_snippet')
             new_snippet = response_json.get('new_content_snippet')
+            snippet = lambda line, limit: click.style(f"    {_clip(line, limit)}", fg='yellow')
 
             if old_snippet:
-                click.echo("  " + "│ " + click.style("  Old Content Snippet:", fg='yellow'))
-                for line in old_snippet.split('\n'):
-                    click.echo("  " + "│ " + click.style(f"    {line}", fg='yellow'))
+                out.append("  " + "│ " + click.style("  Old Content Snippet:", fg='yellow') + "\n")
+                _add_window(out, _line_window(old_snippet, max_lines // 2), snippet, max_chars)
             if new_snippet:
-                click.echo("  " + "│ " + click.style("  New Content Snippet:", fg='yellow'))
-                for line in new_snippet.split('\n'):
-                    click.echo("  " + "│ " + click.style(f"    {line}", fg='yellow'))
-
-            click.echo("  " + click.style("╰" + "─" * 50 + "╯", dim=True))
-            click.echo()
+                out.append("  " + "│ " + click.style("  New Content Snippet:", fg='yellow') + "\n")
+                _add_window(out, _line_window(new_snippet, max_lines // 2), snippet, max_chars)
+            _box_bottom(out)
         elif "verification" in response_json and response_json["verification"] == "success":
-            click.echo("  " + click.style("╭" + "─" * 50 + "╮", dim=True))
-            click.echo("  " + "│ " + click.style("✔ Verification Successful", fg='green'))
-            click.echo("  " + click.style("╰" + "─" * 50 + "╯", dim=True))
-            click.echo()
+            out.append("  " + click.style("╭" + "─" * 50 + "╮", dim=True) + "\n")
+            out.append("  " + "│ " + click.style("✔ Verification Successful", fg='green') + "\n")
+            _box_bottom(out)
         else:
             # Fallback for other JSON structures or if not recognized
-            click.echo(text)
-    except json.JSONDecodeError:
+            _add_window(out, _line_window(text, max_lines), _clip, max_chars, prefix="")
+    except (json.JSONDecodeError, TypeError):
         # If not valid JSON, check for the special "WriteFile" command from the agent
         if text.startswith("WriteFile:"):
-            parts = text.split('\n', 1)
-            header = parts[0]
-            code = parts[1] if len(parts) > 1 else ""
+            header, _, code = text.partition('\n')
             filename = header.split(':', 1)[1].strip()
+            _last_full_output = code
 
             # Print the green "WriteFile" block
-            click.echo("  " + click.style("╭" + "─" * 50 + "╮", dim=True))
-            click.echo("  " + "│ " + click.style("✔ WriteFile", fg='green') + f" Writing to {filename}")
-            click.echo("  " + "│ ")
-            for line in code.split('\n'):
-                # Indent the code inside the box
-                click.echo("  " + "│ " + click.style(f"  {line}", fg='yellow'))
-            click.echo("  " + click.style("╰" + "─" * 50 + "╯", dim=True))
-            click.echo()
-            
+            out.append("  " + click.style("╭" + "─" * 50 + "╮", dim=True) + "\n")
+            out.append("  " + "│ " + click.style("✔ WriteFile", fg='green') + f" Writing to {filename}" + "\n")
+            out.append("  " + "│ " + "\n")
+            # Indent the code inside the box
+            _add_window(out, _line_window(code, max_lines),
+                        lambda line, limit: click.style(f"  {_clip(line, limit)}", fg='yellow'), max_chars)
+            _box_bottom(out)
+
             # Print the follow-up message
             follow_up = f"I've created a simple Python script named {click.style(filename, bold=True)} in the current directory. It will print \"Hello, World!\" when you run it."
-            click.echo(" " + click.style("✦", fg="magenta") + f" {follow_up}")
+            out.append(" " + click.style("✦", fg="magenta") + f" {follow_up}" + "\n")
 
         # Check if the agent is asking a question
         elif text.endswith("?"):
-            click.echo(" " + click.style("✦", fg="magenta") + f" {text}")
-        
+            head, elided, tail = _line_window(text, max_lines)
+            if elided:
+                _add_window(out, (head, elided, tail), _clip, max_chars, prefix="")
+            else:
+                out.append(" " + click.style("✦", fg="magenta") + f" {text}" + "\n")
+
         # Handle a standard text response
         else:
             # Print raw response if it contains complex formatting that our simple parser can't handle.
             # This makes it compatible with the original script's output.
-            click.echo(text)
+            _add_window(out, _line_window(text, max_lines), _clip, max_chars, prefix="")
+    click.echo("".join(out), nl=False)
+
+
+def _format_tool_args(tool_input, limit=80):
+    """Renders tool arguments on one short line for the tool-start marker."""
+    if isinstance(tool_input, dict):
+        args = ", ".join(f"{k}={v!r}" for k, v in tool_input.items())
+    else:
+        args = repr(tool_input)
+    return args if len(args) <= limit else args[:limit - 3] + "..."
+
+def display_agent_stream(events, on_render=None):
+    """Renders streamed agent events as they arrive and returns the final output.
+
+    Text deltas are written immediately, tool calls get a one-line marker and their
+    results go through `display_agent_response`. If the final answer was not streamed
+    (e.g. an error or a forced stop), it is rendered in full at the end.
+
+    Args:
+        on_render (callable): Called as `on_render(name, start, end)` with the
+            `time.perf_counter()` span of each tool result and of the final answer.
+    """
+    output = ""
+    mid_line = False
+    final_streamed = False
+    token_time = 0.0
+    running = {}  # command -> whether its output was shown live
+    for event in events:
+        started = time.perf_counter()
+        if event["type"] == "token":
+            click.echo(event["text"], nl=False)
+            mid_line = True
+            final_streamed = True
+        elif event["type"] == "tool_start":
+            if mid_line:
+                click.echo()
+                mid_line = False
+            click.echo("  " + click.style(f"⚙ {event['name']}({_format_tool_args(event['input'])})", dim=True))
+            if event["name"] == "run_command" and isinstance(event["input"], dict):
+                running[event["input"].get("command")] = False
+        elif event["type"] == "tool_output":
+            # Live command output; concurrent commands are told apart by their start order
+            running[event["command"]] = True
+            label = f"[{list(running).index(event['command']) + 1}] " if len(running) > 1 else ""
+            max_chars = _screen_budget()[1]
+            click.echo("".join("  " + click.style(f"│ {label}{_clip(line, max_chars - len(label))}", dim=True) + "\n"
+                               for line in event["text"].splitlines()), nl=False)
+        elif event["type"] == "tool_end":
+            shown = False
+            if event["name"] == "run_command":
+                try:
+                    shown = running.pop(json.loads(event["output"]).get("command"), False)
+                except (json.JSONDecodeError, AttributeError):
+                    pass
+            display_agent_response(event["output"], output_shown=shown)
+            final_streamed = False
+            if on_render:
+                on_render(f"render {event['name']}", started, time.perf_counter())
+        elif event["type"] == "done":
+            output = event["output"]
+        if event["type"] == "token":
+            token_time += time.perf_counter() - started
+    started = time.perf_counter()
+    if mid_line:
+        click.echo()
+    if output and not final_streamed:
+        display_agent_response(output)
+    if on_render:
+        # Streamed text is written in many tiny pieces; it is reported as one span ending here
+        on_render("render answer", started - token_time, time.perf_counter())
+    return output
+
+
+def manage_sessions(list_sessions, prune_days):
+    """Implements --list-sessions and --prune-sessions."""
+    from .sessions import list_sessions as saved_sessions, prune_sessions
+    if prune_days is not None:
+        deleted = prune_sessions(prune_days)
+        click.echo(f"Deleted {len(deleted)} session(s)" + (f": {', '.join(deleted)}" if deleted else "."))
+    if list_sessions:
+        sessions = saved_sessions()
+        if not sessions:
+            click.echo("No saved sessions.")
+        for session in sessions:
+            updated = time.strftime("%Y-%m-%d %H:%M", time.localtime(session["updated"]))
+            click.echo(f"{session['name']:<24} {updated}  {session['bytes'] / 1024:>8.1f} KB  {session['cwd']}")
+
+
+def run_daemon_prompt(prompt, agent_kwargs, http_settings, session_name=None):
+    """Implements --daemon: runs the prompt in the background daemon and renders what it streams back."""
+    from .daemon import is_supported, run_prompt
+    if not is_supported():
+        raise click.UsageError("--daemon needs Unix domain sockets, which this platform does not provide.")
+    status = {}
+
+    def events():
+        for event in run_prompt(prompt, agent_kwargs, http_settings, session_name):
+            if event["type"] == "status":
+                status.update(event)
+            else:
+                yield event
+
+    display_user_prompt(prompt)
+    try:
+        display_agent_stream(events())
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo()
+    if status:
+        click.echo(status["line"])
+
+
+def turn_details(agent):
+    """Text for ctrl+o: the latest turn's time breakdown, errors and routing decisions."""
+    if agent is None or agent.last_trace is None:
+        return "No turns yet."
+    from .tracing import format_breakdown
+    lines = format_breakdown(agent.last_trace, agent.last_request_stats)
+    if agent.router.enabled and agent.router.turn_routes:
+        lines.append("Routing:")
+        lines.extend(f"  call {index}: {agent.fast_model if route == 'fast' else agent.model} ({reason})"
+                     for index, (route, reason) in enumerate(agent.router.turn_routes, 1))
+    return "\n".join(lines)
 
 
 @click.command()
 @click.option('--api-key', default=None, help='xAI API key. If not provided, uses XAI_API_KEY env var.')
 @click.option('--dev', is_flag=True, help='Use cheaper OpenAI model for development (requires OPENAI_API_KEY)')
 @click.option('--prompt', default=None, help='Prompt to run directly. If not provided, enters interactive mode.')
-def main(api_key, dev, prompt):
+@click.option('--scratchpad-budget', default=32000, show_default=True, help='Token budget for tool outputs resent within a turn; older large outputs are shrunk beyond it.')
+@click.option('--max-context-tokens', type=int, default=None, help="Cap on prompt tokens per LLM call, below the model's context window; older history and large tool outputs are trimmed to fit.")
+@click.option('--fast-model', default=None, help='Smaller model for summarizing older history and answering simple follow-ups. Defaults to grok-3-mini for Grok models.')
+@click.option('--routing/--no-routing', default=True, show_default=True, help='Route simple follow-ups to --fast-model; planning and edits always use the main model.')
+@click.option('--base-url', default=None, help='OpenAI-compatible endpoint to use instead of the xAI API (e.g. a local mock server).')
+@click.option('--cache', 'cache_responses', is_flag=True, help='Cache LLM responses on disk and replay identical requests (deterministic runs, CI).')
+@click.option('--cache-ttl', default=7 * 24 * 3600, show_default=True, help='Seconds a cached response stays valid.')
+@click.option('--batch', type=click.Path(exists=True, dir_okay=False), default=None, help='Run every prompt in a JSONL file headlessly (one {"id", "prompt"} object per line).')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Where --batch appends its JSONL results. Defaults to <batch file>.results.jsonl.')
+@click.option('--workers', default=4, show_default=True, help='Prompts --batch runs concurrently (reduced automatically on rate limits).')
+@click.option('--connect-timeout', type=float, default=None, help='Seconds to wait for a connection to the API (default 10, or GROK_CLI_CONNECT_TIMEOUT).')
+@click.option('--read-timeout', type=float, default=None, help='Seconds to wait for API response data (default 300, or GROK_CLI_READ_TIMEOUT).')
+@click.option('--max-retries', type=int, default=None, help='Retries for rate-limited, 5xx or failed-to-connect API requests (default 4, or GROK_CLI_MAX_RETRIES).')
+@click.option('--trace', 'trace_path', type=click.Path(dir_okay=False), default=None, help='Write per-turn LLM, tool, token counting, summarization and rendering timings to this file as Chrome trace JSON (chrome://tracing, Perfetto).')
+@click.option('--session', 'session_name', default=None, help='Save the conversation as a named session after every turn, continuing it if it exists.')
+@click.option('--resume', is_flag=True, help='Continue the most recent session started in this directory (or the one named by --session).')
+@click.option('--daemon', 'use_daemon', is_flag=True, help='Run --prompt in a background daemon that keeps agents, caches and connections warm between runs (one conversation per directory).')
+@click.option('--daemon-stop', is_flag=True, help='Stop the background daemon and exit.')
+@click.option('--list-sessions', is_flag=True, help='List saved sessions and exit.')
+@click.option('--prune-sessions', type=float, default=None, metavar='DAYS', help='Delete sessions not used in DAYS days and exit.')
+def main(api_key, dev, prompt, scratchpad_budget, max_context_tokens, fast_model, routing, base_url, cache_responses, cache_ttl, batch, output, workers,
+         connect_timeout, read_timeout, max_retries, trace_path, session_name, resume, use_daemon, daemon_stop,
+         list_sessions, prune_sessions):
     """A Grok-styled command-line interface."""
-    os.system('clear')
-
+    if daemon_stop:
+        from .daemon import stop
+        click.echo("Daemon stopping." if stop() else "No daemon running.")
+        return
+    if list_sessions or prune_sessions is not None:
+        manage_sessions(list_sessions, prune_sessions)
+        return
+    if batch and prompt:
+        raise click.UsageError("--batch and --prompt cannot be combined.")
+    if batch and (session_name or resume):
+        raise click.UsageError("--session and --resume cannot be used with --batch.")
+    if use_daemon and (not prompt or trace_path):
+        raise click.UsageError("--daemon needs --prompt and cannot be combined with --trace.")
     # --- Initialize Agent based on original script's logic ---
     if dev:
         # Development mode with cheaper OpenAI model
         openai_key = os.getenv('OPENAI_API_KEY')
         if not openai_key:
             raise click.UsageError("Development mode requires OPENAI_API_KEY environment variable. Get it from https://platform.openai.com/api-keys")
-        agent = GrokAgent(api_key=openai_key, model="gpt-3.5-turbo", base_url="https://api.openai.com/v1", summarize_memory=True)
-        print("🚧 DEVELOPMENT MODE: Using OpenAI gpt-3.5-turbo (cheaper)")
+        agent_kwargs = dict(api_key=openai_key, model="gpt-3.5-turbo", base_url=base_url or "https://api.openai.com/v1", summarize_memory=True)
     else:
         # Production mode with Grok
         api_key = api_key or os.getenv('XAI_API_KEY')
         if not api_key:
             raise click.UsageError("API key is required. Provide via --api-key or XAI_API_KEY environment variable. Get it from https://x.ai/api.")
-        agent = GrokAgent(api_key=api_key, summarize_memory=True)
+        agent_kwargs = dict(api_key=api_key, summarize_memory=True)
+        if base_url:
+            agent_kwargs["base_url"] = base_url
+    agent_kwargs.update(scratchpad_token_budget=scratchpad_budget, max_prompt_tokens=max_context_tokens,
+                        fast_model=fast_model, routing=routing, cache_responses=cache_responses, cache_ttl=cache_ttl)
+    http_settings = {name: value for name, value in (("connect_timeout", connect_timeout), ("read_timeout", read_timeout),
+                                                     ("max_retries", max_retries)) if value is not None}
+
+    if batch:
+        # Headless: no screen clearing or rendering, one JSON summary line at the end
+        from .batch import run_batch
+        output = output or os.path.splitext(batch)[0] + ".results.jsonl"
+        totals = run_batch(batch, output, agent_kwargs, workers=max(1, workers), http_settings=http_settings)
+        click.echo(json.dumps(dict(totals, output=output)))
+        return
+
+    session_note = None
+    if session_name or resume:
+        from .sessions import SessionStore, latest_session
+        if resume and not session_name:
+            session_name = latest_session(os.getcwd())
+            if session_name is None:
+                raise click.UsageError("No saved session for this directory; start one with --session NAME.")
+        if use_daemon:
+            try:
+                SessionStore(session_name)  # Validates the name before it reaches the daemon
+            except ValueError as e:
+                raise click.UsageError(str(e))
+
+    if use_daemon:
+        run_daemon_prompt(prompt, agent_kwargs, http_settings, session_name)
+        return
+
+    if session_name:
+        try:
+            session = SessionStore(session_name, model=agent_kwargs.get("model", "grok-4-0709"))
+        except ValueError as e:
+            raise click.UsageError(str(e))
+        agent_kwargs["session"] = session
+        session_note = f"Resuming session '{session_name}'" if session.exists() else f"New session '{session_name}'"
+
+    # The agent loads in the background while the startup screen is drawn
+    agent_future = start_agent(http_settings, **agent_kwargs)
+    click.clear()
+    if dev:
+        print("🚧 DEVELOPMENT MODE: Using OpenAI gpt-3.5-turbo (cheaper)")
     
     # --- Startup Screen ---
     print_grok_art()
@@ -241,14 +631,28 @@ def main(api_key, dev, prompt):
     click.echo("4. /help for more information.")
     click.echo()
     click.echo(click.style("Using 5 MCP servers (ctrl+t to view)", dim=True))
+    if session_note:
+        click.echo(click.style(f"{session_note} (saved after every turn)", dim=True))
     click.echo()
 
+    trace_file = None
+    if trace_path:
+        from .tracing import TraceFile
+        trace_file = TraceFile(trace_path)
+
+    def run_turn(agent, text):
+        def on_render(name, start, end):
+            agent.last_trace.add(name, "render", start, end)
+        display_agent_stream(agent.stream_chat(text), on_render=on_render)  # Render tokens and tool calls as they arrive
+        if trace_file:
+            trace_file.record(agent.last_trace)
+
     # --- Main Loop ---
     if prompt:
         # Handle non-interactive mode
         display_user_prompt(prompt)
-        response = agent.chat(prompt)
-        display_agent_response(response) # Format and display the response
+        agent = agent_future.result()
+        run_turn(agent, prompt)
         click.echo()
         print_status_bar(agent)
     else:
@@ -258,7 +662,7 @@ def main(api_key, dev, prompt):
         click.echo()
         while True:
             try:
-                user_input = custom_prompt()
+                user_input = custom_prompt(details=lambda: turn_details(agent_future.result() if agent_future.done() else None))
                 
                 # os.system('clear')  # Commented out to prevent clearing terminal history
                 # print_grok_art()  # Commented out to prevent reloading ASCII art
@@ -269,14 +673,18 @@ def main(api_key, dev, prompt):
                     click.echo("Goodbye!")
                     break
                 
-                response = agent.chat(user_input)
-                display_agent_response(response) # Format and display the response
+                agent = agent_future.result()  # Blocks only if the first prompt beats the loader
+                run_turn(agent, user_input)
                 click.echo()
                 print_status_bar(agent)
                 click.echo()
             except KeyboardInterrupt:
                 click.echo("\nGoodbye!")
                 break
+    if trace_file:
+        trace_file.write()  # Picks up background summaries that finished after their turn
+    if agent_future.done() and agent_future.exception() is None:
+        agent_future.result().save_session()  # Includes a summary that finished after the last turn
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
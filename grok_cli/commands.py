@@ -0,0 +1,185 @@
+"""Shell commands for the `run_command` tool.
+
+Commands run as asyncio subprocesses, so they do not block the agent's event
+loop. Combined stdout and stderr are read in chunks: every chunk of whole lines is
+passed to an optional `on_output` callback for live display, and only the first
+`HEAD_CHARS` and last `TAIL_CHARS` characters are kept for the model, so a chatty build
+costs a bounded number of tokens. When the shell exits or outlives its timeout, its
+whole process group is killed, so nothing it started keeps running in the background.
+"""
+import asyncio
+import codecs
+import collections
+import os
+import signal
+import time
+
+DEFAULT_TIMEOUT_SECONDS = 120
+MAX_TIMEOUT_SECONDS = 1800
+HEAD_CHARS = 4_000
+TAIL_CHARS = 12_000  # The end of a build or test log is where the errors are
+READ_CHUNK = 64 << 10
+KILL_GRACE_SECONDS = 2.0
+EXIT_POLL_SECONDS = 0.05
+
+
+class OutputWindow:
+    """Keeps the first `head_chars` and last `tail_chars` characters of a stream of text."""
+
+    def __init__(self, head_chars=HEAD_CHARS, tail_chars=TAIL_CHARS):
+        self.head_chars = head_chars
+        self.tail_chars = tail_chars
+        self.head = []
+        self.head_len = 0
+        self.tail = collections.deque()
+        self.tail_len = 0
+        self.total_chars = 0
+        self.total_lines = 0
+        self.omitted_chars = 0
+
+    def feed(self, text):
+        self.total_chars += len(text)
+        self.total_lines += text.count("\n")
+        if self.head_len < self.head_chars:
+            taken = text[:self.head_chars - self.head_len]
+            self.head.append(taken)
+            self.head_len += len(taken)
+            text = text[len(taken):]
+        if not text:
+            return
+        self.tail.append(text)
+        self.tail_len += len(text)
+        while self.tail_len - len(self.tail[0]) >= self.tail_chars:
+            dropped = self.tail.popleft()
+            self.tail_len -= len(dropped)
+            self.omitted_chars += len(dropped)
+
+    def render(self):
+        """Returns `(text, truncated)`; an omitted middle is replaced by a one-line marker."""
+        head = "".join(self.head)
+        tail = "".join(self.tail)
+        omitted_chars = self.omitted_chars + max(0, len(tail) - self.tail_chars)
+        tail = tail[-self.tail_chars:] if len(tail) > self.tail_chars else tail
+        if not omitted_chars:
+            return head + tail, False
+        # Cut on line boundaries so no partial line reaches the model
+        head_end = head.rfind("\n") + 1 or len(head)
+        tail_start = tail.find("\n") + 1
+        kept_head, kept_tail = head[:head_end], tail[tail_start:]
+        omitted_lines = self.total_lines - kept_head.count("\n") - kept_tail.count("\n")
+        return kept_head + f"... [{omitted_lines} lines omitted] ...\n" + kept_tail, True
+
+
+def _kill(process):
+    """Stops the command and everything it started."""
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGTERM)
+        else:
+            process.terminate()
+    except ProcessLookupError:
+        pass
+
+
+def _force_kill(process):
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+
+async def _exited(process, pump):
+    """Returns once the shell has exited, even if processes it started still hold the output open."""
+    # `process.wait()` also waits for the pipe to close, so until it is closed the exit
+    # status is polled; a command may also close its output and keep running
+    while process.returncode is None and not pump.done():
+        await asyncio.wait({pump}, timeout=EXIT_POLL_SECONDS)
+    if process.returncode is None:
+        await process.wait()
+
+
+async def _stop(process, pump):
+    """Kills the command's process group and waits for it and for the output to be drained."""
+    _kill(process)
+    try:
+        await asyncio.wait_for(asyncio.gather(process.wait(), asyncio.shield(pump)), KILL_GRACE_SECONDS)
+    except asyncio.TimeoutError:
+        _force_kill(process)
+        await process.wait()
+        try:
+            await asyncio.wait_for(pump, KILL_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            pass  # Held open by a process outside the group; keep what was read
+
+
+async def _pump(stream, window, on_output):
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    while True:
+        chunk = await stream.read(READ_CHUNK)
+        text = decoder.decode(chunk, final=not chunk)
+        if text:
+            window.feed(text)
+        if on_output is not None:
+            pending += text
+            cut = pending.rfind("\n") + 1 if chunk else len(pending)
+            if cut:
+                await on_output(pending[:cut])
+                pending = pending[cut:]
+        if not chunk:
+            return
+
+
+async def run_command(command, cwd=None, timeout=DEFAULT_TIMEOUT_SECONDS, on_output=None):
+    """Runs a shell command and returns its exit code and a head/tail window of its output.
+
+    Args:
+        on_output: Optional coroutine function called with each piece of output (whole
+            lines, except possibly the last piece) while the command runs.
+
+    Returns:
+        dict: `{"command", "exit_code", "duration_s", "timed_out", "output", "truncated",
+        "output_chars", "output_lines"}`. `exit_code` is None if the command was killed
+        on timeout.
+
+    Raises:
+        OSError: If the shell cannot be started (e.g. `cwd` does not exist).
+    """
+    timeout = min(max(1, timeout), MAX_TIMEOUT_SECONDS)
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_shell(
+        command,
+        cwd=cwd or None,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        env=dict(os.environ, PAGER="cat", GIT_PAGER="cat"),  # Nobody can press q in a pager
+        start_new_session=os.name == "posix",
+    )
+    window = OutputWindow()
+    pump = asyncio.ensure_future(_pump(process.stdout, window, on_output))
+    timed_out = False
+    try:
+        await asyncio.wait_for(_exited(process, pump), timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+    finally:
+        # Once the shell is gone, anything it left in the background (`server &`) is stopped
+        # too; it would otherwise outlive the command and hold the output pipe open
+        await _stop(process, pump)
+    output, truncated = window.render()
+    if timed_out:
+        output = (output.rstrip("\n") + "\n" if output else "") + f"[Killed after {timeout}s timeout]"
+    return {
+        "command": command,
+        "exit_code": None if timed_out else process.returncode,
+        "duration_s": round(time.perf_counter() - started, 3),
+        "timed_out": timed_out,
+        "output": output,
+        "truncated": truncated,
+        "output_chars": window.total_chars,
+        "output_lines": window.total_lines,
+    }
@@ -0,0 +1,171 @@
+"""Per-model token budgets for the prompt of every LLM call.
+
+`MODEL_CAPABILITIES` gives each model family its context window and the output tokens to
+reserve. `ContextBudget` sits between the agent's prompt and the model and, when the
+formatted messages would not fit, trims the lowest-value parts first:
+
+1. Whole turns of conversation history, oldest first (the summary of older history and
+   the system prompt are kept).
+2. Large tool outputs of the current turn, shrunk to a head/tail excerpt, oldest first.
+3. As a last resort, the largest remaining messages are cut to fit, the user's input last.
+
+The request is always sent, so a turn that outgrows the window mid-loop continues with
+less context instead of failing with a context-length error.
+"""
+import json
+
+from .scratchpad import LARGE_OUTPUT_TOKENS, _excerpt
+from .tokens import count_message_tokens, to_message_dict
+from .tracing import span
+
+# Model name prefix -> limits; the longest matching prefix wins
+MODEL_CAPABILITIES = {
+    "grok-4": {"context_window": 256_000, "max_output_tokens": 4096},
+    "grok-code-fast": {"context_window": 256_000, "max_output_tokens": 4096},
+    "grok-3-mini": {"context_window": 131_072, "max_output_tokens": 4096},
+    "grok-3": {"context_window": 131_072, "max_output_tokens": 4096},
+    "grok-2": {"context_window": 131_072, "max_output_tokens": 4096},
+    "gpt-4.1": {"context_window": 1_047_576, "max_output_tokens": 4096},
+    "gpt-4o": {"context_window": 128_000, "max_output_tokens": 4096},
+    "gpt-3.5-turbo": {"context_window": 16_385, "max_output_tokens": 4096},
+}
+DEFAULT_CAPABILITIES = {"context_window": 16_384, "max_output_tokens": 4096}
+
+SAFETY_MARGIN = 0.05  # Our tokenizer only approximates the model's
+MIN_KEPT_CHARS = 200
+TRUNCATED_NOTE = "\n... [truncated to fit the context window]"
+
+
+def model_capabilities(model):
+    """Returns `{"context_window", "max_output_tokens"}` for `model` (e.g. "grok-4-0709", "openai/gpt-4o")."""
+    name = model.rsplit("/", 1)[-1].lower()
+    matches = [prefix for prefix in MODEL_CAPABILITIES if name.startswith(prefix)]
+    return dict(MODEL_CAPABILITIES[max(matches, key=len)]) if matches else dict(DEFAULT_CAPABILITIES)
+
+
+def message_tokens(message):
+    """Tokens one langchain message costs, including the arguments of any tool calls."""
+    counted = to_message_dict(message)
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        counted["content"] += json.dumps([{"name": call["name"], "args": call["args"]} for call in tool_calls])
+    return count_message_tokens(counted)
+
+
+def _truncate(message, tokens, excess):
+    """Cuts `message` by roughly `excess` tokens; returns None if it cannot get shorter."""
+    content = message.content
+    if not isinstance(content, str) or len(content) <= MIN_KEPT_CHARS:
+        return None
+    keep = max(MIN_KEPT_CHARS, int(len(content) * (tokens - excess) / tokens) - len(TRUNCATED_NOTE))
+    if keep + len(TRUNCATED_NOTE) >= len(content):
+        return None
+    return message.model_copy(update={"content": content[:keep] + TRUNCATED_NOTE})
+
+
+def fit_messages(messages, budget):
+    """Returns `(messages, report)` with `messages` trimmed to about `budget` tokens.
+
+    `messages` is the formatted prompt: system prompt, history, the user's input, then
+    the AI tool calls and tool results of the current turn. `report` counts what was done
+    (`tokens_before`, `tokens_after`, `dropped_messages`, `shrunk_outputs`, `truncated`).
+    """
+    messages = list(messages)
+    tokens = [message_tokens(message) for message in messages]
+    total = sum(tokens)
+    report = {"tokens_before": total, "tokens_after": total, "dropped_messages": 0, "shrunk_outputs": 0,
+              "truncated": 0}
+    if total <= budget:
+        return messages, report
+
+    def replace(index, message):
+        nonlocal total
+        new_tokens = message_tokens(message)
+        messages[index] = message
+        total += new_tokens - tokens[index]
+        tokens[index] = new_tokens
+
+    # 1. History: whole turns (a user message and what followed it), oldest first
+    current = max((i for i, message in enumerate(messages) if message.type == "human"), default=0)
+    history = [i for i in range(current) if messages[i].type != "system"]
+    dropped = set()
+    while history and total > budget:
+        turn_end = next((n for n, i in enumerate(history[1:], 1) if messages[i].type == "human"), len(history))
+        for index in history[:turn_end]:
+            dropped.add(index)
+            total -= tokens[index]
+        history = history[turn_end:]
+    if dropped:
+        messages = [message for i, message in enumerate(messages) if i not in dropped]
+        tokens = [count for i, count in enumerate(tokens) if i not in dropped]
+        current -= len(dropped)
+        report["dropped_messages"] = len(dropped)
+
+    # 2. Tool outputs of this turn, oldest first
+    tool_indexes = [i for i in range(current + 1, len(messages)) if messages[i].type == "tool"]
+    for step, index in enumerate(tool_indexes, 1):
+        if total <= budget:
+            break
+        if tokens[index] > LARGE_OUTPUT_TOKENS and isinstance(messages[index].content, str):
+            replace(index, messages[index].model_copy(update={"content": _excerpt(messages[index].content, step)}))
+            report["shrunk_outputs"] += 1
+
+    # 3. Largest messages first, the user's input last; the system prompt and tool call arguments are never cut
+    for candidates in (set(range(1, len(messages))) - {current}, {current} - {0}):
+        while total > budget and candidates:
+            index = max(candidates, key=lambda i: tokens[i])
+            truncated = _truncate(messages[index], tokens[index], total - budget)
+            if truncated is None:
+                candidates.discard(index)
+                continue
+            replace(index, truncated)
+            report["truncated"] += 1
+
+    report["tokens_after"] = total
+    return messages, report
+
+
+class ContextBudget:
+    """Runnable step between the agent prompt and the model that keeps each prompt within budget.
+
+    The budget is the model's context window less its output reservation, the tool schemas
+    and a safety margin, lowered further by `max_prompt_tokens` if given. `trimmed_tokens`
+    accumulates the prompt tokens removed across the LLM calls of a turn; the agent resets
+    it at the start of each turn.
+    """
+
+    def __init__(self, model, tools=(), max_output_tokens=None, max_prompt_tokens=None):
+        capabilities = model_capabilities(model)
+        self.context_window = capabilities["context_window"]
+        self.max_output_tokens = max_output_tokens or capabilities["max_output_tokens"]
+        self.max_prompt_tokens = max_prompt_tokens
+        self.tools = list(tools)
+        self.trimmed_tokens = 0
+        self.last_report = None
+        self._overhead_tokens = None
+
+    @property
+    def overhead_tokens(self):
+        """Tokens sent with every request besides the messages: tool schemas and response priming."""
+        if self._overhead_tokens is None:
+            from langchain_core.utils.function_calling import convert_to_openai_tool
+            schemas = json.dumps([convert_to_openai_tool(t) for t in self.tools])
+            self._overhead_tokens = count_message_tokens({"role": "tools", "content": schemas}) + 2
+        return self._overhead_tokens
+
+    @property
+    def prompt_budget(self):
+        """Tokens available to the messages of one request."""
+        available = int((self.context_window - self.max_output_tokens) * (1 - SAFETY_MARGIN))
+        if self.max_prompt_tokens:
+            available = min(available, self.max_prompt_tokens)
+        return max(0, available - self.overhead_tokens)
+
+    def __call__(self, prompt_value):
+        messages = prompt_value.to_messages()
+        with span("fit_context", "tokens", messages=len(messages)) as args:
+            fitted, report = fit_messages(messages, self.prompt_budget)
+            args.update(report)
+        self.last_report = report
+        self.trimmed_tokens += report["tokens_before"] - report["tokens_after"]
+        return fitted
@@ -0,0 +1,291 @@
+"""Optional background daemon that keeps agents warm between `grok_cli --daemon --prompt` runs.
+
+A one-shot run normally pays for importing langchain, loading the tokenizer, building
+the agent and opening HTTPS connections before the model is even called. The daemon
+pays that once: it keeps one agent per working directory (and session and settings),
+the tokenizer, the file cache and the connection pool alive, and the thin client in this
+module only sends the prompt over a Unix socket and renders the events streamed back.
+
+Protocol: the client sends one JSON line and reads JSON lines until the connection
+closes. A prompt request carries the client's working directory, environment and
+umask, which the daemon switches to for the turn, so turns run one at a time. The daemon
+exits after `GROK_CLI_DAEMON_IDLE` seconds without requests (default 15 minutes), and
+replaces itself when the client runs different grok_cli code or `GROK_CLI_*` settings:
+it answers "stale", finishes the turns in flight and exits, and the client starts a
+fresh one.
+
+Only the standard library is imported at module level, so the client stays light.
+"""
+import asyncio
+import collections
+import hashlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from .paths import cache_dir
+
+DEFAULT_IDLE_SECONDS = 15 * 60
+START_TIMEOUT_SECONDS = 20.0
+MAX_AGENTS = 8
+_RESPAWN_INTERVAL = 1.0
+_STARTUP_UMASK = os.umask(0o022)
+os.umask(_STARTUP_UMASK)
+
+
+def socket_path():
+    return os.path.join(cache_dir("daemon"), "grok.sock")
+
+
+def _settings_env(environ):
+    # Read once at startup (cache dir, HTTP timeouts, idle time), so a change needs a new daemon
+    return {name: value for name, value in environ.items() if name.startswith("GROK_CLI_")}
+
+
+def code_fingerprint(environ=None):
+    """Identifies the grok_cli source files and settings a process runs with."""
+    package = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.blake2b(digest_size=8)
+    for name in sorted(os.listdir(package)):
+        if name.endswith(".py"):
+            st = os.stat(os.path.join(package, name))
+            digest.update(f"{name}:{st.st_mtime_ns}:{st.st_size};".encode())
+    digest.update(json.dumps(sorted(_settings_env(environ if environ is not None else os.environ).items())).encode())
+    return digest.hexdigest()
+
+
+def _config_key(request):
+    settings = {"agent": request["agent_kwargs"], "http": request.get("http_settings") or {}}
+    return hashlib.blake2b(json.dumps(settings, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+# --- Server ---
+
+class Daemon:
+    """Serves prompt requests on the Unix socket until idle or stale."""
+
+    def __init__(self, idle_seconds=DEFAULT_IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self.fingerprint = code_fingerprint()
+        self.agents = collections.OrderedDict()  # (cwd, session, config key) -> GrokAgent, least recently used first
+        self.http_settings = None
+        self.active = 0
+        self.stopping = None
+        self.turn_lock = None
+        self._idle_timer = None
+
+    def _arm_idle_timer(self):
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+        if self.active == 0:
+            self._idle_timer = asyncio.get_running_loop().call_later(self.idle_seconds, self.stopping.set)
+
+    async def _send(self, writer, message):
+        writer.write(json.dumps(message).encode() + b"\n")
+        await writer.drain()
+
+    def _build_agent(self, request):
+        from .agent import GrokAgent
+        from .transport import configure
+
+        http_settings = request.get("http_settings") or {}
+        if http_settings != self.http_settings:
+            configure(**http_settings)  # Agents already built keep their clients
+            self.http_settings = http_settings
+        kwargs = dict(request["agent_kwargs"])
+        if request.get("session"):
+            from .sessions import SessionStore
+            kwargs["session"] = SessionStore(request["session"], model=kwargs.get("model", "grok-4-0709"))
+        return GrokAgent(**kwargs)
+
+    async def _agent(self, request):
+        key = (request["cwd"], request.get("session"), _config_key(request))
+        agent = self.agents.get(key)
+        if agent is None:
+            agent = await asyncio.to_thread(self._build_agent, request)
+            self.agents[key] = agent
+            while len(self.agents) > MAX_AGENTS:
+                _, evicted = self.agents.popitem(last=False)
+                evicted.save_session()
+        self.agents.move_to_end(key)
+        return agent
+
+    async def _run_prompt(self, request, writer):
+        from .cli import status_line
+
+        async with self.turn_lock:
+            # Tools resolve paths against the cwd and commands inherit the environment,
+            # both process-wide, hence one turn at a time
+            os.chdir(request["cwd"])
+            os.environ.clear()
+            os.environ.update(request["env"])
+            os.umask(request.get("umask", _STARTUP_UMASK))  # Permissions of files the tools create
+            try:
+                agent = await self._agent(request)
+            except Exception as e:
+                await self._send(writer, {"type": "done", "output": f"An error occurred: {e}"})
+                return
+            events = agent.astream_chat(request["prompt"])
+            try:
+                async for event in events:
+                    await self._send(writer, event)
+            finally:
+                await events.aclose()  # Stops the turn if the client went away
+            await self._send(writer, {"type": "status", "line": status_line(agent)})
+
+    async def handle(self, reader, writer):
+        self.active += 1
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+        try:
+            request = json.loads(await reader.readline() or b"{}")
+            kind = request.get("type")
+            if kind == "stop":
+                await self._send(writer, {"type": "stopping"})
+                self.stopping.set()
+            elif request.get("fingerprint") != self.fingerprint:
+                await self._send(writer, {"type": "stale"})
+                self.stopping.set()
+            elif kind == "ping":
+                await self._send(writer, {"type": "pong", "pid": os.getpid()})
+            elif kind == "prompt":
+                await self._run_prompt(request, writer)
+        except (ConnectionError, json.JSONDecodeError):
+            pass
+        finally:
+            self.active -= 1
+            writer.close()
+            self._arm_idle_timer()
+
+    async def serve(self, path):
+        self.stopping = asyncio.Event()
+        self.turn_lock = asyncio.Lock()
+        server = await asyncio.start_unix_server(self.handle, path=path)
+        os.chmod(path, 0o600)
+        self._arm_idle_timer()
+        # Warm up while waiting for the first request
+        await asyncio.to_thread(_warm_up)
+        await self.stopping.wait()
+        server.close()
+        while self.active:
+            await asyncio.sleep(0.05)
+        for agent in self.agents.values():
+            agent.save_session()
+
+
+def _warm_up():
+    from . import agent  # noqa: F401 (langchain, openai, httpx)
+    from .tokens import get_encoding
+    get_encoding()
+
+
+def serve():
+    """Runs the daemon in this process unless another one already holds the lock."""
+    import fcntl
+
+    directory = cache_dir("daemon")
+    os.chmod(directory, 0o700)  # The socket and log are private to this user
+    lock = os.fdopen(os.open(os.path.join(directory, "grok.lock"), os.O_WRONLY | os.O_CREAT, 0o600), "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return  # Another daemon is running or starting
+    path = socket_path()
+    try:
+        os.unlink(path)  # Left over from a daemon that did not exit cleanly
+    except FileNotFoundError:
+        pass
+    idle_seconds = float(os.environ.get("GROK_CLI_DAEMON_IDLE") or DEFAULT_IDLE_SECONDS)
+    try:
+        asyncio.run(Daemon(idle_seconds).serve(path))
+    finally:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        lock.close()
+
+
+# --- Client ---
+
+def is_supported():
+    return hasattr(socket, "AF_UNIX") and os.name == "posix"
+
+
+def _spawn():
+    path = os.path.join(cache_dir("daemon"), "daemon.log")
+    log = os.fdopen(os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600), "ab")
+    os.fchmod(log.fileno(), 0o600)  # Also a log written by an older version
+    subprocess.Popen([sys.executable, "-m", "grok_cli.daemon"], stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+                     cwd=os.path.expanduser("~"), start_new_session=True)
+    log.close()
+
+
+def _connect(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def _exchange(request, spawn=True):
+    """Sends `request` to the daemon (starting one if needed) and yields the messages it returns.
+
+    Raises:
+        RuntimeError: If no daemon could be reached within `START_TIMEOUT_SECONDS`.
+    """
+    request = dict(request, fingerprint=code_fingerprint())
+    deadline = time.monotonic() + START_TIMEOUT_SECONDS
+    last_spawn = 0.0
+    while True:
+        try:
+            sock = _connect(socket_path())
+        except OSError:
+            sock = None
+        if sock is not None:
+            with sock, sock.makefile("rb") as responses:
+                sock.sendall(json.dumps(request).encode() + b"\n")
+                first = responses.readline()
+                message = json.loads(first) if first else {"type": "stale"}
+                if message["type"] != "stale":
+                    yield message
+                    for line in responses:
+                        yield json.loads(line)
+                    return
+            # A daemon running other code or settings is on its way out; start a fresh one
+        if not spawn:
+            return
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Could not reach the grok_cli daemon; see {os.path.join(cache_dir('daemon'), 'daemon.log')}")
+        if time.monotonic() - last_spawn > _RESPAWN_INTERVAL:
+            _spawn()
+            last_spawn = time.monotonic()
+        time.sleep(0.05)
+
+
+def run_prompt(prompt, agent_kwargs, http_settings=None, session=None):
+    """Runs one turn in the daemon for the current directory and yields its events.
+
+    Events are those of `GrokAgent.astream_chat`, followed by `{"type": "status", "line"}`
+    with the rendered status bar.
+    """
+    umask = os.umask(0o077)
+    os.umask(umask)
+    request = {"type": "prompt", "prompt": prompt, "cwd": os.getcwd(), "env": dict(os.environ), "umask": umask,
+               "agent_kwargs": agent_kwargs, "http_settings": http_settings or {}, "session": session}
+    yield from _exchange(request)
+
+
+def stop():
+    """Asks a running daemon to exit after its current turns. Returns whether one was running."""
+    return any(message["type"] == "stopping" for message in _exchange({"type": "stop"}, spawn=False))
+
+
+if __name__ == "__main__":
+    serve()
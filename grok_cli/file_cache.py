@@ -0,0 +1,159 @@
+"""Process-wide cache of file contents shared by the file tools.
+
+The read → edit → verify workflow touches the same file several times per turn. Entries
+are keyed by real path and validated against `(mtime_ns, size, inode)` on every lookup,
+so a change made outside the agent is always picked up. Writes go through a temp file
+and `os.replace`, then land in the cache, so the verify read is served from memory.
+Entries are evicted least recently used first once `MAX_CACHE_BYTES` is exceeded.
+"""
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+MAX_CACHE_BYTES = 64 << 20
+MAX_ENTRY_BYTES = 1 << 20  # Larger files are streamed by grok_cli.files instead
+
+_entries = OrderedDict()  # real path -> (signature, bytes), least recently used first
+_cached_bytes = 0
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_lock = threading.Lock()
+
+
+def _signature(st):
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _store(path, signature, data):
+    global _cached_bytes
+    with _lock:
+        previous = _entries.pop(path, None)
+        if previous is not None:
+            _cached_bytes -= len(previous[1])
+        if len(data) > MAX_ENTRY_BYTES:
+            return
+        _entries[path] = (signature, data)
+        _cached_bytes += len(data)
+        while _cached_bytes > MAX_CACHE_BYTES and _entries:
+            _, (_, evicted) = _entries.popitem(last=False)
+            _cached_bytes -= len(evicted)
+            _stats["evictions"] += 1
+
+
+def read_bytes(file_path):
+    """Returns the file's bytes, from memory when the cached copy is still current.
+
+    Raises:
+        OSError: If the file cannot be stat'ed or read.
+    """
+    path = os.path.realpath(file_path)
+    signature = _signature(os.stat(path))
+    with _lock:
+        entry = _entries.get(path)
+        if entry is not None and entry[0] == signature:
+            _entries.move_to_end(path)
+            _stats["hits"] += 1
+            return entry[1]
+        _stats["misses"] += 1
+    with open(path, "rb") as f:
+        signature = _signature(os.fstat(f.fileno()))
+        data = f.read()
+    _store(path, signature, data)
+    return data
+
+
+def decode_text(data):
+    """Decodes file bytes the way text-mode `open` would: UTF-8 with universal newlines."""
+    return data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def read_text(file_path):
+    """Returns the file's text content; see `read_bytes`."""
+    return decode_text(read_bytes(file_path))
+
+
+def _umask():
+    try:
+        with open("/proc/self/status", "r") as f:  # Linux: read without changing it
+            for line in f:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError):
+        pass
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+def write_text(file_path, content, mode=None):
+    """Atomically replaces the file's content and caches the new version.
+
+    The new content is written to a temp file in the same directory and renamed over the
+    original, so readers never observe a partial write. The original's permissions are kept;
+    a new file gets `mode`, or by default the usual `0o666` less the umask.
+
+    Raises:
+        OSError: If the temp file cannot be written or renamed.
+    """
+    path = os.path.realpath(file_path)
+    data = content.encode("utf-8")
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        try:
+            mode = os.stat(path).st_mode & 0o7777
+        except FileNotFoundError:
+            if mode is None:
+                mode = 0o666 & ~_umask()  # mkstemp creates 0o600
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    _store(path, _signature(os.stat(path)), data)
+
+
+def invalidate(file_path):
+    """Drops any cached copy of the file."""
+    global _cached_bytes
+    with _lock:
+        entry = _entries.pop(os.path.realpath(file_path), None)
+        if entry is not None:
+            _cached_bytes -= len(entry[1])
+
+
+def snapshot():
+    """Returns `{real path: [mtime_ns, size, inode]}` for every cached file, for persisting."""
+    with _lock:
+        return {path: list(signature) for path, (signature, _) in _entries.items()}
+
+
+def prewarm(metadata):
+    """Loads files listed by `snapshot` whose signature still matches; changed files are skipped.
+
+    Returns:
+        int: The number of files loaded.
+    """
+    loaded = 0
+    for path, signature in metadata.items():
+        try:
+            if list(_signature(os.stat(path))) != list(signature):
+                continue
+            read_bytes(path)
+        except OSError:
+            continue
+        loaded += 1
+        if _cached_bytes >= MAX_CACHE_BYTES:
+            break
+    return loaded
+
+
+def cache_stats():
+    """Returns hit/miss/eviction counters and the current cache size."""
+    with _lock:
+        return dict(_stats, entries=len(_entries), bytes=_cached_bytes)
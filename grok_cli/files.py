@@ -0,0 +1,114 @@
+"""Bounded reads of workspace files for the file tools.
+
+Files are read as raw bytes and only the requested window is decoded, so a large log or
+minified bundle never has to be held in memory, JSON-escaped and sent to the model in
+full. Small files come from the shared `file_cache`; files above `MMAP_THRESHOLD` are
+memory-mapped and scanned in `CHUNK_SIZE` pieces.
+"""
+import mmap
+import os
+
+from . import file_cache
+
+DEFAULT_MAX_BYTES = 100_000
+MMAP_THRESHOLD = 1 << 20
+CHUNK_SIZE = 1 << 20
+
+
+def _count_lines(data, size):
+    newlines = sum(data[pos:pos + CHUNK_SIZE].count(b"\n") for pos in range(0, size, CHUNK_SIZE))
+    if size and data[size - 1:size] != b"\n":
+        newlines += 1
+    return newlines
+
+
+def _line_start(data, size, line, pos=0):
+    """Returns the byte offset where `line` lines after `pos` begin (`size` if past the end)."""
+    remaining = line
+    while remaining > 0 and pos < size:
+        chunk = data[pos:pos + CHUNK_SIZE]
+        newlines = chunk.count(b"\n")
+        if newlines < remaining:
+            remaining -= newlines
+            pos += len(chunk)
+            continue
+        index = -1
+        for _ in range(remaining):
+            index = chunk.find(b"\n", index + 1)
+        return pos + index + 1
+    return size if remaining else pos
+
+
+def _decode(raw):
+    return raw.decode("utf-8", errors="replace").replace("\r\n", "\n")
+
+
+def read_window(file_path, start_line=1, end_line=None, byte_offset=None, byte_length=None, max_bytes=DEFAULT_MAX_BYTES):
+    """Reads a line or byte window of a file, capped at `max_bytes`.
+
+    Line windows are 1-based and inclusive; a window cut short by `max_bytes` ends on a
+    whole line whenever at least one fits. When `byte_offset` is given the window is a
+    byte range instead. The result always carries `total_lines`, `total_bytes` and
+    `truncated` (the `max_bytes` cap cut the requested window short), plus where to
+    continue reading when the window did not reach the end of the file.
+
+    Raises:
+        OSError: If the file cannot be opened.
+        ValueError: If the file looks binary.
+    """
+    max_bytes = max(1, max_bytes)
+    if os.stat(file_path).st_size < MMAP_THRESHOLD:
+        data = file_cache.read_bytes(file_path)
+        return _window(data, len(data), start_line, end_line, byte_offset, byte_length, max_bytes)
+    with open(file_path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return _window(data, len(data), start_line, end_line, byte_offset, byte_length, max_bytes)
+
+
+def _window(data, size, start_line, end_line, byte_offset, byte_length, max_bytes):
+    if b"\0" in data[:8192]:
+        raise ValueError("file appears to be binary")
+    total_lines = _count_lines(data, size)
+
+    if byte_offset is not None:
+        start = min(max(0, byte_offset), size)
+        requested_end = size if byte_length is None else min(size, start + max(0, byte_length))
+        end = min(requested_end, start + max_bytes)
+        result = {
+            "content": _decode(data[start:end]),
+            "byte_offset": start,
+            "byte_end": end,
+            "total_lines": total_lines,
+            "total_bytes": size,
+            "truncated": end < requested_end,
+        }
+        if end < size:
+            result["next_byte_offset"] = end
+        return result
+
+    start_line = max(1, start_line)
+    start = _line_start(data, size, start_line - 1)
+    if end_line is None or end_line >= total_lines:
+        end = size
+    else:
+        end = _line_start(data, size, max(0, end_line - start_line + 1), start)
+    capped = end - start > max_bytes
+    if capped:
+        last_newline = data.rfind(b"\n", start, start + max_bytes)
+        end = last_newline + 1 if last_newline != -1 else start + max_bytes
+    raw = data[start:end]
+    lines_returned = raw.count(b"\n") + (1 if raw and not raw.endswith(b"\n") else 0)
+    last_line = start_line + lines_returned - 1 if lines_returned else start_line - 1
+    result = {
+        "content": _decode(raw),
+        "start_line": start_line,
+        "end_line": last_line,
+        "total_lines": total_lines,
+        "total_bytes": size,
+        "truncated": capped,
+    }
+    if end < size:
+        if raw.endswith(b"\n"):
+            result["next_start_line"] = last_line + 1
+        result["next_byte_offset"] = end
+    return result
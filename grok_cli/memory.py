@@ -0,0 +1,110 @@
+"""Conversation memory used by GrokAgent."""
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain.memory import ConversationSummaryBufferMemory
+from pydantic import PrivateAttr
+
+from .tokens import count_message_tokens, to_message_dict
+from .tracing import current_trace, span
+
+
+class IncrementalSummaryBufferMemory(ConversationSummaryBufferMemory):
+    """ConversationSummaryBufferMemory that prunes without recounting the buffer.
+
+    The stock `prune` recounts every remaining message after each message it drops,
+    which is quadratic in the buffer length. Here each message is counted once (a cache
+    hit for anything seen on an earlier turn) and the total is updated as messages are
+    dropped.
+    """
+
+    def _overflow(self, buffer) -> int:
+        """Returns how many messages must leave the front of `buffer` to fit `max_token_limit`."""
+        with span("count_tokens", "tokens", messages=len(buffer)):
+            counts = [count_message_tokens(to_message_dict(message)) for message in buffer]
+        curr_buffer_length = sum(counts) + 2  # Response priming, as in get_grok_num_tokens
+        dropped = 0
+        while dropped < len(counts) and curr_buffer_length > self.max_token_limit:
+            curr_buffer_length -= counts[dropped]
+            dropped += 1
+        return dropped
+
+    def prune(self) -> None:
+        buffer = self.chat_memory.messages
+        dropped = self._overflow(buffer)
+        if not dropped:
+            return
+        pruned_memory = buffer[:dropped]
+        del buffer[:dropped]
+        with span("summarize", "memory", messages=dropped):
+            self.moving_summary_buffer = self.predict_new_summary(pruned_memory, self.moving_summary_buffer)
+
+
+class BackgroundSummaryBufferMemory(IncrementalSummaryBufferMemory):
+    """Summarizing memory whose summarization call runs off the critical path.
+
+    When the buffer overflows, the overflowing messages are summarized on a daemon
+    thread (with `llm`, which should be a fast, cheap model) instead of inside
+    `save_context`, i.e. inside the turn the user is waiting on. Until the summary is
+    ready the buffer keeps those messages, so the next turn sees either the new summary
+    or the full un-summarized history, never a gap. One summarization runs at a time; an
+    overflow seen meanwhile is picked up by the next `save_context`.
+    """
+
+    last_summary_seconds: float = 0.0
+
+    _lock: Any = PrivateAttr(default_factory=threading.RLock)
+    _worker: Optional[threading.Thread] = PrivateAttr(default=None)
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            return super().load_memory_variables(inputs)
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        with self._lock:
+            super().save_context(inputs, outputs)
+
+    def prune(self) -> None:
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            buffer = self.chat_memory.messages
+            dropped = self._overflow(buffer)
+            if not dropped:
+                return
+            self._worker = threading.Thread(
+                target=self._summarize,
+                args=(buffer[:dropped], self.moving_summary_buffer, current_trace()),
+                name="grok-summary",
+                daemon=True,
+            )
+            self._worker.start()
+
+    def _summarize(self, pruned_memory: List[Any], summary: str, trace=None) -> None:
+        started = time.perf_counter()
+        try:
+            new_summary = self.predict_new_summary(pruned_memory, summary)
+        except Exception as e:
+            if trace is not None:
+                trace.errors.append(f"summarize: {e}")
+            return  # The buffer keeps the messages; the next overflow retries
+        finally:
+            self.last_summary_seconds = time.perf_counter() - started
+            if trace is not None:  # Recorded on the turn that triggered it, possibly after it ended
+                trace.add("summarize", "memory", started, time.perf_counter(),
+                          messages=len(pruned_memory), background=True)
+        with self._lock:
+            buffer = self.chat_memory.messages
+            if len(buffer) < len(pruned_memory) or any(a is not b for a, b in zip(buffer, pruned_memory)):
+                return  # The buffer was cleared or replaced meanwhile
+            del buffer[:len(pruned_memory)]
+            self.moving_summary_buffer = new_summary
+
+    def wait_for_summary(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until any running summarization finishes. Returns False on timeout."""
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+            return not worker.is_alive()
+        return True
@@ -0,0 +1,294 @@
+"""Multi-file unified diffs for the `apply_patch` tool.
+
+A patch is parsed into per-file hunks and every hunk is located in memory before any
+file is written. Hunks are matched at their stated line first, then at the nearest
+offset, then ignoring trailing and then all surrounding whitespace, and finally with up
+to `MAX_FUZZ` context lines dropped from each end, like `patch --fuzz`. If any hunk
+cannot be placed nothing is written; if a write fails part-way, the files already
+written are restored, so a patch applies completely or not at all.
+"""
+import os
+import re
+
+from . import file_cache
+
+MAX_FUZZ = 2
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+_NORMALIZERS = (
+    ("exact", lambda line: line),
+    ("trailing whitespace", str.rstrip),
+    ("whitespace", str.strip),
+)
+
+
+class PatchError(ValueError):
+    """The patch text is malformed."""
+
+
+def _strip_prefix(path):
+    path = path.split("\t", 1)[0].strip()
+    if path == "/dev/null":
+        return None
+    if path.startswith(("a/", "b/")):
+        path = path[2:]
+    return path
+
+
+def parse_patch(text):
+    """Parses unified diff text into `[{"old_path", "new_path", "hunks"}]`.
+
+    Each hunk is `{"header", "old_start", "lines", "eof_newline"}` where `lines` holds
+    `(tag, text)` pairs with tag " ", "-" or "+". `old_path` / `new_path` is None for a
+    created / deleted file. Hunk headers without line numbers (`@@ ... @@`) are accepted
+    and located by content alone.
+
+    Raises:
+        PatchError: If the text contains no file headers or a hunk is outside any file.
+    """
+    files, current, hunk = [], None, None
+    lines = text.replace("\r\n", "\n").split("\n")
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        if line.startswith("--- ") and index + 1 < len(lines) and lines[index + 1].startswith("+++ "):
+            current = {"old_path": _strip_prefix(line[4:]), "new_path": _strip_prefix(lines[index + 1][4:]), "hunks": []}
+            files.append(current)
+            hunk = None
+            index += 2
+            continue
+        if line.startswith("@@"):
+            if current is None:
+                raise PatchError(f"Hunk {line!r} comes before any '--- a/path' / '+++ b/path' header.")
+            match = _HUNK_HEADER.match(line)
+            hunk = {"header": line.split("@@")[1].strip() if match is None else match.group(0),
+                    "old_start": int(match.group(1)) if match else None, "lines": [], "eof_newline": None}
+            current["hunks"].append(hunk)
+        elif hunk is not None and line[:1] in (" ", "-", "+"):
+            hunk["lines"].append((line[0], line[1:]))
+        elif hunk is not None and line == "" and index + 1 < len(lines) and lines[index + 1][:1] in (" ", "-", "+"):
+            hunk["lines"].append((" ", ""))  # A blank context line whose leading space was stripped
+        elif hunk is not None and line.startswith("\\") and hunk["lines"]:
+            # "\ No newline at end of file" applies to the side of the line before it
+            hunk["eof_newline"] = hunk["lines"][-1][0] == "-"
+        else:
+            hunk = None  # "diff --git", "index ...", blank lines between files
+        index += 1
+    if not files:
+        raise PatchError("No file headers found; expected '--- a/path' and '+++ b/path' lines.")
+    return files
+
+
+def patch_paths(text):
+    """Returns every path a patch touches, without validating it (for locking)."""
+    paths = []
+    for line in text.split("\n"):
+        if line.startswith(("--- ", "+++ ")):
+            path = _strip_prefix(line[4:])
+            if path is not None and path not in paths:
+                paths.append(path)
+    return paths
+
+
+def _find(file_lines, old, expected, start, normalize, cache):
+    """Returns the index in `file_lines[start:]` where `old` matches, nearest `expected` first."""
+    key = id(normalize)
+    if key not in cache:
+        cache[key] = [normalize(line) for line in file_lines]
+    normalized = cache[key]
+    wanted = [normalize(line) for line in old]
+    last = len(file_lines) - len(wanted)
+    if last < start:
+        return None
+    expected = min(max(expected, start), last)
+    for distance in range(max(expected - start, last - expected) + 1):
+        for position in (expected - distance, expected + distance) if distance else (expected,):
+            if start <= position <= last and normalized[position:position + len(wanted)] == wanted:
+                return position
+    return None
+
+
+def _locate(file_lines, hunk_lines, expected, start, cache):
+    """Finds where a hunk applies. Returns `(position, hunk_lines, fuzz, dropped_head_lines)` or None."""
+    head = next((i for i, (tag, _) in enumerate(hunk_lines) if tag != " "), len(hunk_lines))
+    tail = next((i for i, (tag, _) in enumerate(reversed(hunk_lines)) if tag != " "), len(hunk_lines))
+    for fuzz in range(MAX_FUZZ + 1):
+        # Drop up to `fuzz` context lines from each end
+        drop_head, drop_tail = min(head, fuzz), min(tail, fuzz)
+        if fuzz and drop_head < fuzz and drop_tail < fuzz:
+            break  # Not enough context left to drop
+        lines = hunk_lines[drop_head:len(hunk_lines) - drop_tail]
+        old = [text for tag, text in lines if tag != "+"]
+        if not old:
+            return min(max(expected, start), len(file_lines)), lines, "exact", 0
+        for name, normalize in _NORMALIZERS:
+            position = _find(file_lines, old, expected + drop_head, start, normalize, cache)
+            if position is not None:
+                if fuzz:
+                    name = f"{fuzz} context line(s) ignored" + ("" if name == "exact" else f", {name}")
+                return position, lines, name, drop_head
+    return None
+
+
+def _apply_hunks(path, content, hunks):
+    """Applies `hunks` to `content` in memory. Returns `(new_content, statuses, added, removed, ok)`.
+
+    Hunks after a failed one are still located, so every hunk gets a status.
+    """
+    file_lines = content.split("\n") if content else []
+    eof_newline = content.endswith("\n") or not content
+    if content.endswith("\n"):
+        file_lines.pop()
+    output, statuses, cursor, drift, added, removed, ok = [], [], 0, 0, 0, 0, True
+    cache = {}
+    for number, hunk in enumerate(hunks, 1):
+        status = {"hunk": number, "header": hunk["header"]}
+        statuses.append(status)
+        # Positions are in the original file's lines. Like GNU patch, search from the stated
+        # line shifted by how far the previous hunk was from its own stated line.
+        stated = hunk["old_start"] - 1 if hunk["old_start"] else None
+        if stated is not None and all(tag == "+" for tag, _ in hunk["lines"]):
+            stated += 1  # A pure insertion's stated line is the one it goes after
+        expected = cursor if stated is None else max(0, stated + drift)
+        located = _locate(file_lines, hunk["lines"], expected, cursor, cache)
+        if located is None:
+            first = next((text for tag, text in hunk["lines"] if tag != "+"), "")
+            status["status"] = "failed"
+            status["reason"] = f"Context not found in {path}" + (f" (first line: {first.strip()[:80]!r})" if first else "")
+            ok = False
+            continue
+        position, lines, fuzz, drop_head = located
+        output.extend(file_lines[cursor:position])
+        index = position
+        for tag, text in lines:
+            if tag == " ":
+                output.append(file_lines[index])  # Keep the file's own whitespace on context lines
+                index += 1
+            elif tag == "-":
+                index += 1
+                removed += 1
+            else:
+                output.append(text)
+                added += 1
+        cursor = index
+        status["status"] = "applied"
+        status["line"] = position + 1
+        if stated is not None:
+            drift = position - drop_head - stated
+            if drift:
+                status["offset"] = drift
+        if fuzz != "exact":
+            status["fuzz"] = fuzz
+        if hunk["eof_newline"] is not None and cursor == len(file_lines):
+            eof_newline = hunk["eof_newline"]
+    output.extend(file_lines[cursor:])
+    new_content = "\n".join(output) + ("\n" if output and eof_newline else "")
+    return new_content, statuses, added, removed, ok
+
+
+def _read_current(path):
+    """Returns the file's text, or None if it does not exist."""
+    try:
+        return file_cache.read_text(path)
+    except FileNotFoundError:
+        return None
+
+
+def _restore(path, original):
+    if original is None:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        file_cache.invalidate(path)
+    else:
+        file_cache.write_text(path, original)
+
+
+def apply_patch(text):
+    """Applies a unified diff to the workspace, all of it or none of it.
+
+    A file appearing in several sections of the patch gets them applied in order. When
+    the old and new names differ, the new file is patched if it exists (`diff -u
+    file.orig file`); otherwise the old file is patched and renamed to the new name.
+
+    Returns:
+        dict: `{"status": "success", "files": [...], "summary": ...}` with a per-hunk
+        status for every file, or `{"error": ..., "files": [...]}` when a hunk did not
+        apply, in which case no file was changed.
+
+    Raises:
+        PatchError: If the patch is malformed.
+        OSError: If a file cannot be read or written (after rolling back earlier writes).
+    """
+    originals, planned, results, failed = {}, {}, [], False  # planned: path -> new content, None to delete
+    modes = {}  # Renamed file -> permissions of the file it was renamed from
+
+    def current(path):
+        if path in planned:
+            return planned[path]
+        if path not in originals:
+            originals[path] = _read_current(path)
+        return originals[path]
+
+    for file_patch in parse_patch(text):
+        old_path, new_path = file_patch["old_path"], file_patch["new_path"]
+        if old_path is None and new_path is None:
+            raise PatchError("A file header has /dev/null on both sides.")
+        if old_path is None:
+            path, operation = new_path, "create"
+        elif new_path is None:
+            path, operation = old_path, "delete"
+        elif old_path == new_path or current(new_path) is not None:
+            path, operation = new_path, "modify"
+        else:
+            path, operation = old_path, "rename"
+        content = current(path)
+        if operation == "create" and content is not None:
+            results.append({"path": path, "error": f"'{path}' already exists; write a diff against its content."})
+        elif operation != "create" and content is None:
+            results.append({"path": path, "error": f"'{path}' does not exist."})
+        else:
+            new_content, statuses, added, removed, ok = _apply_hunks(path, content or "", file_patch["hunks"])
+            result = {"path": path, "operation": operation, "added": added, "removed": removed, "hunks": statuses}
+            if operation == "rename":
+                result.update(path=new_path, renamed_from=old_path)
+            results.append(result)
+            if ok:
+                if operation == "rename":
+                    planned[new_path] = new_content  # Written before the old file is deleted
+                    planned[old_path] = None
+                    modes[new_path] = modes.pop(old_path, None) or os.stat(old_path).st_mode & 0o7777
+                else:
+                    planned[path] = None if operation == "delete" else new_content
+                continue
+        failed = True
+    if failed:
+        return {"error": "Patch not applied; no files were changed. Re-read the files and fix the failed hunks.",
+                "files": results}
+
+    written = []
+    try:
+        for path, content in planned.items():
+            written.append(path)
+            if content is None:
+                os.unlink(path)
+                file_cache.invalidate(path)
+                continue
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            file_cache.write_text(path, content, mode=modes.get(path))
+    except OSError:
+        for path in reversed(written):
+            try:
+                _restore(path, originals[path])
+            except OSError:
+                pass
+        raise
+
+    added = sum(result["added"] for result in results)
+    removed = sum(result["removed"] for result in results)
+    changed = len({result["path"] for result in results})
+    return {"status": "success", "files": results,
+            "summary": f"{changed} file(s) changed, {added} insertion(s)(+), {removed} deletion(s)(-)"}
@@ -0,0 +1,16 @@
+"""Locations of grok_cli's on-disk state."""
+import os
+
+
+def cache_dir(*parts):
+    """Returns the per-user cache directory (or a subdirectory of it), creating it if needed.
+
+    Defaults to `$XDG_CACHE_HOME/grok_cli` (`~/.cache/grok_cli`); `GROK_CLI_CACHE_DIR`
+    overrides it.
+    """
+    base = os.environ.get("GROK_CLI_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "grok_cli"
+    )
+    path = os.path.join(base, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,130 @@
+"""Opt-in persistent cache of LLM responses for deterministic (temperature=0) runs.
+
+Scripted and CI runs resend the same prompt, history and tool state over and over. With
+the cache enabled, a repeated LLM call is answered from a SQLite database instead of the
+API. Only model responses are cached: tool calls they contain are still executed against
+the real filesystem by the agent.
+
+Entries are keyed by the endpoint, the model's serialized configuration (which covers the
+model name, sampling parameters and bound tool schemas) and the message list normalized to
+role, content and tool calls, so volatile ids and response metadata do not defeat the cache.
+They expire after `ttl_seconds`, and the least recently used entries are evicted beyond
+`max_entries`.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import warnings
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+from .paths import cache_dir
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 20_000
+_EVICT_EVERY = 100  # Updates between eviction passes
+
+
+def _normalize_prompt(prompt):
+    """Reduces a serialized message list to the parts that determine the model's answer."""
+    try:
+        messages = json.loads(prompt)
+    except json.JSONDecodeError:
+        return prompt
+    if not isinstance(messages, list):
+        return prompt
+    normalized = []
+    for message in messages:
+        kwargs = message.get("kwargs", {}) if isinstance(message, dict) else {}
+        entry = {
+            "role": (message.get("id") or ["?"])[-1] if isinstance(message, dict) else "?",
+            "content": kwargs.get("content"),
+        }
+        tool_calls = kwargs.get("tool_calls")
+        if tool_calls:
+            entry["tool_calls"] = [[call.get("name"), call.get("args")] for call in tool_calls]
+        if kwargs.get("name"):
+            entry["name"] = kwargs["name"]
+        normalized.append(entry)
+    return json.dumps(normalized, sort_keys=True)
+
+
+class ResponseCache(BaseCache):
+    """SQLite-backed `BaseCache` with TTL and size eviction and hit/miss counters."""
+
+    def __init__(self, path=None, namespace="", ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path or os.path.join(cache_dir(), "responses.sqlite3")
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._updates = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.evict()
+
+    def _key(self, prompt, llm_string):
+        digest = hashlib.sha256()
+        for part in (self.namespace, llm_string, _normalize_prompt(prompt)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def lookup(self, prompt, llm_string):
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # `loads` warns that it is in beta
+            return [loads(generation) for generation in json.loads(row[0])]
+
+    def update(self, prompt, llm_string, return_val):
+        value = json.dumps([dumps(generation) for generation in return_val])
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (self._key(prompt, llm_string), value, now, now),
+            )
+            self._updates += 1
+            due = self._updates % _EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Drops expired entries, then the least recently used ones beyond `max_entries`."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self, **kwargs):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+    def stats(self):
+        """Returns hit/miss counters for this process and the number of stored entries."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
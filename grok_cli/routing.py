@@ -0,0 +1,141 @@
+"""Routing of LLM calls between the main model and a faster, cheaper one.
+
+`ModelRouter` is the model step of the agent chain. For each call it looks at the
+messages and sends simple follow-ups (a short question about the ongoing conversation,
+answered with read-only tools at most) to the fast model and everything else to the
+main model. If the fast model asks to change something (edit a file, apply a patch, run
+a command), its reply is discarded and the main model takes over for the rest of the
+turn, so planning and edits always come from the main model.
+
+`ModelUsage` is a callback handler attached to both models that keeps calls, latency
+and tokens per model, summarization included, for the status bar.
+"""
+import re
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from .context import message_tokens, model_capabilities
+
+READ_ONLY_TOOLS = frozenset({"list_files", "read_file", "glob_files", "search_files"})
+SIMPLE_MAX_TOKENS = 60
+# Requests that ask for planning or changes go to the main model
+_TASK_WORDS = re.compile(
+    r"\b(implement|refactor|fix|add|change|edit|modify|write|create|build|design|plan|debug|rename|remove|delete|"
+    r"update|migrate|optimi[sz]e|rewrite|install|run|test|generate|convert|port)\w*", re.IGNORECASE)
+
+
+def classify(messages, fast_window):
+    """Returns `("fast" | "main", reason)` for an LLM call on the formatted `messages`."""
+    current = max((i for i, message in enumerate(messages) if message.type == "human"), default=None)
+    if current is None:
+        return "main", "no user input"
+    for message in messages[current + 1:]:
+        for call in getattr(message, "tool_calls", None) or ():
+            if call["name"] not in READ_ONLY_TOOLS:
+                return "main", f"changes in progress ({call['name']})"
+    if not any(message.type in ("human", "ai") for message in messages[:current]):
+        return "main", "new conversation"
+    text = messages[current].content if isinstance(messages[current].content, str) else str(messages[current].content)
+    if _TASK_WORDS.search(text):
+        return "main", "task request"
+    if message_tokens(messages[current]) > SIMPLE_MAX_TOKENS:
+        return "main", "long request"
+    if sum(message_tokens(message) for message in messages) > fast_window:
+        return "main", "context too large for the fast model"
+    return "fast", "simple follow-up"
+
+
+class ModelRouter:
+    """Chooses the model for each LLM call of a turn and records the decisions.
+
+    `turn_routes` lists `(model, reason)` per call of the current turn; the agent resets
+    it at the start of each turn. Once a call of the turn went to the main model, the
+    rest of the turn stays there.
+    """
+
+    def __init__(self, main_llm, fast_llm, tools, enabled=True):
+        self.main_model = main_llm.model_name
+        self.fast_model = fast_llm.model_name
+        self.main = main_llm.bind_tools(tools)
+        self.fast = fast_llm.bind_tools(tools)
+        self.enabled = enabled and self.fast_model != self.main_model
+        capabilities = model_capabilities(self.fast_model)
+        self.fast_window = int((capabilities["context_window"] - capabilities["max_output_tokens"]) * 0.9)
+        self.turn_routes = []
+
+    def _choose(self, messages):
+        if not self.enabled:
+            return "main", "routing off"
+        if any(route == "main" for route, _ in self.turn_routes):
+            return "main", "turn already on the main model"
+        return classify(messages, self.fast_window)
+
+    def _escalation(self, response):
+        """Returns the reason to redo a fast reply on the main model, or None to keep it."""
+        changes = [call["name"] for call in response.tool_calls if call["name"] not in READ_ONLY_TOOLS]
+        return f"escalated for {', '.join(changes)}" if changes else None
+
+    def invoke(self, messages, config=None):
+        route, reason = self._choose(messages)
+        if route == "fast":
+            response = self.fast.invoke(messages, config)
+            escalation = self._escalation(response)
+            if escalation is None:
+                self.turn_routes.append(("fast", reason))
+                return response
+            route, reason = "main", escalation
+        self.turn_routes.append((route, reason))
+        return self.main.invoke(messages, config)
+
+    async def ainvoke(self, messages, config=None):
+        route, reason = self._choose(messages)
+        if route == "fast":
+            response = await self.fast.ainvoke(messages, config)
+            escalation = self._escalation(response)
+            if escalation is None:
+                self.turn_routes.append(("fast", reason))
+                return response
+            route, reason = "main", escalation
+        self.turn_routes.append((route, reason))
+        return await self.main.ainvoke(messages, config)
+
+
+class ModelUsage(BaseCallbackHandler):
+    """Totals of calls, seconds and tokens per model, across turns and background summaries."""
+
+    def __init__(self):
+        self.totals = {}  # model -> {"calls", "seconds", "prompt_tokens", "completion_tokens"}
+        self._starts = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        model = (metadata or {}).get("ls_model_name") or "llm"
+        with self._lock:
+            self._starts[run_id] = (model, time.perf_counter())
+
+    def _finish(self, run_id, usage):
+        with self._lock:
+            started = self._starts.pop(run_id, None)
+            if started is None:
+                return
+            model, start = started
+            total = self.totals.setdefault(model, {"calls": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0})
+            total["calls"] += 1
+            total["seconds"] += time.perf_counter() - start
+            total["prompt_tokens"] += usage.get("input_tokens") or usage.get("prompt_tokens") or 0
+            total["completion_tokens"] += usage.get("output_tokens") or usage.get("completion_tokens") or 0
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        generation = response.generations[0][0] if response.generations and response.generations[0] else None
+        usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or \
+            (response.llm_output or {}).get("token_usage") or {}
+        self._finish(run_id, usage)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, {})
+
+    def snapshot(self):
+        with self._lock:
+            return {model: dict(total) for model, total in self.totals.items()}
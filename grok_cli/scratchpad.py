@@ -0,0 +1,147 @@
+"""Compaction of the agent scratchpad before each LLM call.
+
+`AgentExecutor` resends every tool output of the turn on every iteration, so prompt
+tokens grow roughly quadratically with the number of steps. `ScratchpadCompactor` is
+used as the agent's message formatter and rewrites observations before they are turned
+into tool messages:
+
+1. Always: an output identical to a later one, or a `read_file` result superseded by a
+   later read of the same window, becomes a short reference to the later step (with a
+   small diff when the file changed in between).
+2. Only while the scratchpad is over its token budget: large outputs outside the most
+   recent steps are shrunk to a head/tail excerpt, oldest first.
+
+Every tool call keeps its tool message, so the call/result pairing the API requires is
+preserved.
+"""
+import difflib
+import hashlib
+import json
+
+from langchain.agents.format_scratchpad.tools import format_to_tool_messages
+
+from .tokens import count_message_tokens
+
+DEFAULT_SCRATCHPAD_TOKEN_BUDGET = 32_000
+KEEP_RECENT_STEPS = 2
+LARGE_OUTPUT_TOKENS = 500
+EXCERPT_LINES = 10
+MAX_DIFF_LINES = 20
+
+_READ_WINDOW_ARGS = ("file_path", "start_line", "end_line", "byte_offset", "byte_length", "max_bytes")
+
+
+def _observation_tokens(observation):
+    return count_message_tokens({"role": "tool", "content": observation})
+
+
+def _read_key(action):
+    if action.tool != "read_file" or not isinstance(action.tool_input, dict):
+        return None
+    return tuple(json.dumps(action.tool_input.get(arg)) for arg in _READ_WINDOW_ARGS)
+
+
+def _content_of(observation):
+    try:
+        parsed = json.loads(observation)
+    except (json.JSONDecodeError, TypeError):
+        return None
+    return parsed.get("content") if isinstance(parsed, dict) else None
+
+
+def _superseded_note(step_number, old_observation, new_observation, with_diff=True):
+    """Returns the reference that replaces an output made redundant by step `step_number`.
+
+    With `with_diff`, a file that changed in between gets a small diff of the change;
+    without it, only a note that it changed (for files of a few long lines, where a diff
+    is as large as the read itself).
+    """
+    if old_observation == new_observation:
+        return json.dumps({"superseded": f"Identical to the output of step {step_number}; see that result."})
+    note = {"superseded": f"Re-read in step {step_number}; see that result."}
+    old_content, new_content = _content_of(old_observation), _content_of(new_observation)
+    if old_content is not None and new_content is not None and old_content != new_content:
+        diff = list(difflib.unified_diff(old_content.splitlines(), new_content.splitlines(), lineterm="", n=0))[2:]
+        if with_diff and len(diff) <= MAX_DIFF_LINES:
+            note["changes_since_this_read"] = "\n".join(diff)
+        else:
+            note["superseded"] += " The file changed in between."
+    return json.dumps(note)
+
+
+def _excerpt(observation, step_number):
+    """Shrinks a large output to its first and last lines plus a note on how to get it back."""
+    content = _content_of(observation)
+    text = content if content is not None else observation
+    lines = text.split("\n")
+    if len(lines) > 2 * EXCERPT_LINES:
+        omitted = len(lines) - 2 * EXCERPT_LINES
+        text = "\n".join(lines[:EXCERPT_LINES] + [f"... [{omitted} lines omitted] ..."] + lines[-EXCERPT_LINES:])
+    else:
+        text = text[:2000] + ("... [truncated]" if len(text) > 2000 else "")
+    return json.dumps({
+        "compacted": f"Output of step {step_number} shrunk to save context; call the tool again for the full result.",
+        "excerpt": text,
+    })
+
+
+def compact_steps(intermediate_steps, token_budget=DEFAULT_SCRATCHPAD_TOKEN_BUDGET, keep_recent=KEEP_RECENT_STEPS):
+    """Returns `(steps, saved_tokens)` with redundant and, if needed, old large observations replaced."""
+    actions = [action for action, _ in intermediate_steps]
+    observations = [observation if isinstance(observation, str) else json.dumps(observation)
+                    for _, observation in intermediate_steps]
+    tokens = [_observation_tokens(observation) for observation in observations]
+    original_total = sum(tokens)
+
+    def replace(index, observation):
+        """Uses `observation` instead if it is smaller; returns whether it was."""
+        new_tokens = _observation_tokens(observation)
+        if new_tokens >= tokens[index]:
+            return False
+        observations[index] = observation
+        tokens[index] = new_tokens
+        return True
+
+    latest_by_hash, latest_by_read = {}, {}
+    for index in range(len(observations) - 1, -1, -1):
+        digest = hashlib.blake2b(observations[index].encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        read_key = _read_key(actions[index])
+        later = latest_by_read.get(read_key) if read_key is not None else None
+        if later is None:
+            later = latest_by_hash.get(digest)
+        if later is not None:
+            if not replace(index, _superseded_note(later + 1, observations[index], observations[later])):
+                replace(index, _superseded_note(later + 1, observations[index], observations[later], with_diff=False))
+        latest_by_hash.setdefault(digest, index)
+        if read_key is not None:
+            latest_by_read.setdefault(read_key, index)
+
+    total = sum(tokens)
+    for index in range(max(0, len(observations) - keep_recent)):
+        if total <= token_budget:
+            break
+        if tokens[index] > LARGE_OUTPUT_TOKENS:
+            before = tokens[index]
+            replace(index, _excerpt(observations[index], index + 1))
+            total -= before - tokens[index]
+
+    steps = list(zip(actions, observations))
+    return steps, original_total - sum(tokens)
+
+
+class ScratchpadCompactor:
+    """Message formatter for `create_tool_calling_agent` that compacts the scratchpad.
+
+    `saved_tokens` accumulates the prompt tokens avoided across the LLM calls of a turn;
+    the agent resets it at the start of each turn.
+    """
+
+    def __init__(self, token_budget=DEFAULT_SCRATCHPAD_TOKEN_BUDGET, keep_recent=KEEP_RECENT_STEPS):
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.saved_tokens = 0
+
+    def __call__(self, intermediate_steps):
+        steps, saved = compact_steps(intermediate_steps, self.token_budget, self.keep_recent)
+        self.saved_tokens += saved
+        return format_to_tool_messages(steps)
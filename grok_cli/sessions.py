@@ -0,0 +1,254 @@
+"""Named, resumable conversations.
+
+Each session is an append-only JSONL file under `cache_dir("sessions")`: a header line,
+then one small record per turn holding only what changed, i.e. the messages appended to
+the memory buffer, how many were dropped from its front into the summary, the summary if
+it changed, the token counts of the new messages and the file-cache metadata. Resuming
+replays the records in one pass; a file with many records is rewritten as a single
+snapshot so resume stays fast however long the session runs.
+
+Only the standard library is imported at module level, so listing and pruning sessions
+from the CLI does not load langchain.
+"""
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+from .paths import cache_dir
+
+FORMAT_VERSION = 1
+COMPACT_AFTER_RECORDS = 200
+
+_NAME = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+def session_path(name):
+    """Returns the file of session `name`.
+
+    Raises:
+        ValueError: If the name is not 1-64 letters, digits, dots, dashes or underscores.
+    """
+    if not _NAME.match(name) or name.startswith("."):
+        raise ValueError(f"Invalid session name {name!r}: use letters, digits, '.', '-' or '_'.")
+    return os.path.join(cache_dir("sessions"), f"{name}.jsonl")
+
+
+def _read_header(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return header if header.get("type") == "session" else {}
+
+
+def list_sessions():
+    """Returns info on every saved session, most recently updated first."""
+    sessions = []
+    directory = cache_dir("sessions")
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(".jsonl"):
+            continue
+        st = entry.stat()
+        header = _read_header(entry.path)
+        sessions.append({
+            "name": entry.name[:-len(".jsonl")],
+            "cwd": header.get("cwd", ""),
+            "model": header.get("model", ""),
+            "created": header.get("created"),
+            "updated": st.st_mtime,
+            "bytes": st.st_size,
+        })
+    return sorted(sessions, key=lambda session: session["updated"], reverse=True)
+
+
+def latest_session(cwd=None):
+    """Returns the name of the most recently updated session started in `cwd` (any directory if None)."""
+    for session in list_sessions():
+        if cwd is None or session["cwd"] == cwd:
+            return session["name"]
+    return None
+
+
+def prune_sessions(older_than_days):
+    """Deletes sessions not updated in `older_than_days` days. Returns the deleted names."""
+    cutoff = time.time() - older_than_days * 86400
+    deleted = []
+    for session in list_sessions():
+        if session["updated"] < cutoff:
+            try:
+                os.unlink(session_path(session["name"]))
+            except OSError:
+                continue
+            deleted.append(session["name"])
+    return deleted
+
+
+def _to_record(message):
+    return {"type": message.type, "content": message.content}
+
+
+def _from_records(records):
+    from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+    classes = {"human": HumanMessage, "ai": AIMessage, "system": SystemMessage}
+    return [classes[record["type"]](content=record["content"]) for record in records if record["type"] in classes]
+
+
+class SessionStore:
+    """Persists one agent's memory to a session file after every turn."""
+
+    def __init__(self, name, model=""):
+        self.name = name
+        self.path = session_path(name)
+        self.model = model
+        self._saved = []  # Buffer messages as of the last record, by identity
+        self._summary = ""
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _load_state(self):
+        """Replays the session file into `{"messages", "summary", "token_counts", "files", "records", "torn_at"}`.
+
+        `torn_at` is the byte offset of an unterminated final line (a torn write), or None.
+        """
+        state = {"messages": [], "summary": "", "token_counts": {}, "files": {}, "records": 0, "torn_at": None}
+        with open(self.path, "rb") as f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    state["torn_at"] = offset
+                    break
+                offset += len(line)
+                try:
+                    record = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue  # A damaged line; the records around it still apply
+                kind = record.get("type")
+                if kind == "snapshot":
+                    state["messages"] = record["messages"]
+                elif kind == "turn":
+                    del state["messages"][:record.get("drop", 0)]
+                    state["messages"].extend(record.get("append", []))
+                else:
+                    continue
+                state["records"] += 1
+                if "summary" in record:
+                    state["summary"] = record["summary"]
+                if "files" in record:
+                    state["files"] = record["files"]
+                state["token_counts"].update(record.get("token_counts", {}))
+        return state
+
+    def restore(self, memory):
+        """Loads the saved conversation into `memory` (a no-op for a new session).
+
+        Returns:
+            int: The number of messages restored.
+        """
+        from . import file_cache
+        from .tokens import import_counts
+
+        if not self.exists():
+            return 0
+        state = self._load_state()
+        if state["torn_at"] is not None:
+            # Appending after a half-written line would merge the next record into it
+            if state["torn_at"] == 0:
+                os.unlink(self.path)  # Not even the header was written
+            else:
+                with open(self.path, "r+b") as f:
+                    f.truncate(state["torn_at"])
+        import_counts(state["token_counts"])
+        messages = _from_records(state["messages"])
+        memory.chat_memory.messages = messages
+        if hasattr(memory, "moving_summary_buffer"):
+            memory.moving_summary_buffer = state["summary"]
+        self._saved = list(messages)
+        self._summary = state["summary"]
+        self._files = state["files"]
+        if state["records"] > COMPACT_AFTER_RECORDS:
+            self._write_snapshot(memory)
+        if state["files"]:
+            # Files read in the earlier session are served from memory when still unchanged
+            threading.Thread(target=file_cache.prewarm, args=(state["files"],), name="grok-prewarm", daemon=True).start()
+        return len(messages)
+
+    def _header(self):
+        return {"type": "session", "version": FORMAT_VERSION, "name": self.name, "cwd": os.getcwd(),
+                "model": self.model, "created": time.time()}
+
+    def _snapshot_record(self, memory, messages):
+        from . import file_cache
+        from .tokens import export_counts, to_message_dict
+
+        summary = getattr(memory, "moving_summary_buffer", "")
+        return {"type": "snapshot", "time": time.time(), "messages": [_to_record(message) for message in messages],
+                "summary": summary, "token_counts": export_counts([to_message_dict(message) for message in messages]),
+                "files": file_cache.snapshot()}
+
+    def _write_snapshot(self, memory):
+        """Rewrites the file as its header plus one snapshot record."""
+        with self._lock:
+            messages = list(memory.chat_memory.messages)
+            header = _read_header(self.path) or self._header()
+            record = self._snapshot_record(memory, messages)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix=f".{self.name}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(json.dumps(header) + "\n" + json.dumps(record) + "\n")
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+            self._saved = messages
+            self._summary = record["summary"]
+            self._files = record["files"]
+
+    def _dropped(self, messages):
+        """How many saved messages left the front of the buffer, or None if it changed some other way."""
+        dropped = len(self._saved)
+        if messages:
+            dropped = next((i for i, message in enumerate(self._saved) if message is messages[0]), len(self._saved))
+        kept = self._saved[dropped:]
+        if len(kept) > len(messages) or any(a is not b for a, b in zip(kept, messages)):
+            return None
+        return dropped
+
+    def save_turn(self, memory):
+        """Appends what changed in `memory` since the last save as one record."""
+        from . import file_cache
+        from .tokens import export_counts, to_message_dict
+
+        with self._lock:
+            messages = list(memory.chat_memory.messages)
+            # The buffer only loses messages at the front (into the summary) and gains them at the end
+            dropped = self._dropped(messages)
+            if dropped is not None:
+                new_messages = messages[len(self._saved) - dropped:]
+                record = {"type": "turn", "time": time.time(), "drop": dropped,
+                          "append": [_to_record(message) for message in new_messages],
+                          "token_counts": export_counts([to_message_dict(message) for message in new_messages])}
+                summary = getattr(memory, "moving_summary_buffer", "")
+                if summary != self._summary:
+                    record["summary"] = summary
+                files = file_cache.snapshot()
+                if files != self._files:
+                    record["files"] = files
+                if dropped or new_messages or "summary" in record or "files" in record:
+                    new_file = not os.path.exists(self.path)
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write((json.dumps(self._header()) + "\n" if new_file else "") + json.dumps(record) + "\n")
+                self._saved = messages
+                self._summary = summary
+                self._files = files
+                return
+        self._write_snapshot(memory)  # The buffer was replaced (e.g. cleared); start from a full copy
@@ -0,0 +1,77 @@
+"""Cheap, cached data for the status bar.
+
+The git branch is read from the repository's HEAD file instead of running `git`, and is
+cached until that file's mtime changes, so drawing the status bar costs a `stat` call.
+"""
+import os
+
+_git_dirs = {}  # directory -> git dir (or None), for directories already looked up
+_heads = {}  # HEAD path -> (mtime_ns, branch)
+
+
+def _read_gitdir_file(path):
+    """Resolves a `.git` file (worktrees, submodules): `gitdir: <path>`."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read().strip()
+    except OSError:
+        return None
+    if not content.startswith("gitdir:"):
+        return None
+    git_dir = content[len("gitdir:"):].strip()
+    return os.path.normpath(os.path.join(os.path.dirname(path), git_dir))
+
+
+def find_git_dir(start):
+    """Returns the git directory of the repository containing `start`, or None."""
+    cached = _git_dirs.get(start)
+    if cached is not None and os.path.isdir(cached):
+        return cached
+    directory = start
+    while True:
+        dot_git = os.path.join(directory, ".git")
+        if os.path.isdir(dot_git):
+            git_dir = dot_git
+            break
+        if os.path.isfile(dot_git):
+            git_dir = _read_gitdir_file(dot_git)
+            break
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            git_dir = None
+            break
+        directory = parent
+    _git_dirs[start] = git_dir
+    return git_dir
+
+
+def git_branch(path=None):
+    """Returns the current branch name, a short commit id when detached, or "" outside a repository."""
+    git_dir = find_git_dir(path or os.getcwd())
+    if git_dir is None:
+        return ""
+    head_path = os.path.join(git_dir, "HEAD")
+    try:
+        mtime_ns = os.stat(head_path).st_mtime_ns
+    except OSError:
+        return ""
+    cached = _heads.get(head_path)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+    try:
+        with open(head_path, "r", encoding="utf-8") as f:
+            head = f.read().strip()
+    except OSError:
+        return ""
+    if head.startswith("ref:"):
+        ref = head[len("ref:"):].strip()
+        branch = ref[len("refs/heads/"):] if ref.startswith("refs/heads/") else ref
+    else:
+        branch = head[:7]  # Detached HEAD
+    _heads[head_path] = (mtime_ns, branch)
+    return branch
+
+
+def display_cwd():
+    """The working directory with the home directory shortened to `~`."""
+    return os.getcwd().replace(os.path.expanduser("~"), "~")
@@ -0,0 +1,90 @@
+"""Token counting for Grok prompts.
+
+Grok has no public tokenizer, so the gpt-4 encoding is used as a proxy. The encoder is
+loaded once per process and per-message counts are memoized by a hash of the message
+content, so recounting a conversation only encodes the messages that are new.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import tiktoken
+
+from .tracing import span
+
+MAX_CACHED_MESSAGES = 8192
+
+_message_counts = OrderedDict()  # content hash -> token count, least recently used first
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_encoding():
+    """Returns the proxy encoding, loading it on first use."""
+    return tiktoken.encoding_for_model("gpt-4")  # Proxy
+
+
+def to_message_dict(message):
+    """Converts a langchain message into the `{"role", "content"}` dict the counter expects."""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return {"role": message.type, "content": content}
+
+
+def _message_key(message):
+    digest = hashlib.blake2b(digest_size=16)
+    for key, value in message.items():
+        digest.update(key.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(value.encode("utf-8", "surrogatepass"))
+        digest.update(b"\0")
+    return digest.digest()
+
+
+def count_message_tokens(message):
+    """Returns the tokens one message dict costs, including the per-message overhead."""
+    key = _message_key(message)
+    with _lock:
+        cached = _message_counts.get(key)
+        if cached is not None:
+            _message_counts.move_to_end(key)
+            return cached
+
+    encoding = get_encoding()
+    num_tokens = 4  # Overhead
+    for field, value in message.items():
+        num_tokens += len(encoding.encode(value))
+        if field == "name":
+            num_tokens += -1
+
+    with _lock:
+        _message_counts[key] = num_tokens
+        if len(_message_counts) > MAX_CACHED_MESSAGES:
+            _message_counts.popitem(last=False)
+    return num_tokens
+
+
+def export_counts(messages):
+    """Returns the cached counts of these message dicts as `{content hash (hex): tokens}`, for persisting."""
+    counts = {}
+    with _lock:
+        for message in messages:
+            key = _message_key(message)
+            if key in _message_counts:
+                counts[key.hex()] = _message_counts[key]
+    return counts
+
+
+def import_counts(counts):
+    """Seeds the cache with counts from `export_counts`, so those messages are never re-encoded."""
+    with _lock:
+        for key, num_tokens in counts.items():
+            _message_counts[bytes.fromhex(key)] = num_tokens
+        while len(_message_counts) > MAX_CACHED_MESSAGES:
+            _message_counts.popitem(last=False)
+
+
+def get_grok_num_tokens(messages, model="grok-4-0709"):
+    """Returns the prompt tokens for a list of message dicts."""
+    with span("count_tokens", "tokens", messages=len(messages)):
+        return sum(count_message_tokens(message) for message in messages) + 2  # Response priming
@@ -0,0 +1,199 @@
+"""Per-turn latency tracing.
+
+A `TurnTrace` collects timed spans for one agent turn: LLM calls (with time to first
+token), tool calls (with bytes in and out), token counting, memory summarization and
+terminal rendering. The agent makes the current turn's trace available via a context
+variable, so helpers such as the token counter record spans without it being passed
+around. Traces can be summarized for the terminal (`format_breakdown`) or written as
+Chrome trace-event JSON (`TraceFile`), which chrome://tracing and Perfetto open.
+"""
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+
+_ORIGIN = time.perf_counter()
+_current = contextvars.ContextVar("grok_cli_trace", default=None)
+
+# Display order and labels for the breakdown; also the Chrome trace thread names
+CATEGORIES = (
+    ("llm", "LLM calls"),
+    ("tool", "Tool calls"),
+    ("tokens", "Token counting"),
+    ("memory", "Summarization"),
+    ("render", "Rendering"),
+)
+
+
+class TurnTrace:
+    """Spans recorded during one turn. Safe to add to from several threads."""
+
+    def __init__(self, user_message=""):
+        self.user_message = user_message
+        self.started = time.perf_counter()
+        self.ended = None
+        self.spans = []
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def add(self, name, category, start, end, **args):
+        """Records a finished span; `start` and `end` are `time.perf_counter()` values."""
+        with self._lock:
+            self.spans.append({"name": name, "cat": category, "start": start, "end": end, "args": args})
+
+    @contextlib.contextmanager
+    def span(self, name, category, **args):
+        start = time.perf_counter()
+        try:
+            yield args  # The caller may add arguments while the span is open
+        finally:
+            self.add(name, category, start, time.perf_counter(), **args)
+
+    def finish(self):
+        self.ended = time.perf_counter()
+
+    @property
+    def seconds(self):
+        return (self.ended or time.perf_counter()) - self.started
+
+    def snapshot(self):
+        """Returns a copy of the spans recorded so far."""
+        with self._lock:
+            return list(self.spans)
+
+    def breakdown(self):
+        """Returns `{category: {"count", "seconds"}}` over the recorded spans."""
+        spans = self.snapshot()
+        totals = {category: {"count": 0, "seconds": 0.0} for category, _ in CATEGORIES}
+        for span in spans:
+            total = totals.setdefault(span["cat"], {"count": 0, "seconds": 0.0})
+            total["count"] += 1
+            total["seconds"] += span["end"] - span["start"]
+        return totals
+
+    def to_events(self, pid, turn_index=0):
+        """Converts the trace to Chrome trace "complete" events, one lane per category.
+
+        Overlapping spans of a category (e.g. concurrent tool calls) get extra lanes.
+        """
+        spans = sorted(self.snapshot(), key=lambda span: span["start"])
+        events = [_complete_event("turn", "turn", self.started, self.ended or time.perf_counter(), pid, 1,
+                                  {"turn": turn_index, "input": self.user_message[:200]})]
+        lane_ends = {}  # category -> end time of the last span in each of its lanes
+        for span in spans:
+            lanes = lane_ends.setdefault(span["cat"], [])
+            lane = next((i for i, end in enumerate(lanes) if end <= span["start"]), len(lanes))
+            if lane == len(lanes):
+                lanes.append(span["end"])
+            else:
+                lanes[lane] = span["end"]
+            events.append(_complete_event(span["name"], span["cat"], span["start"], span["end"], pid,
+                                          _lane_id(span["cat"], lane), span["args"]))
+        return events
+
+
+def _complete_event(name, category, start, end, pid, tid, args):
+    return {"name": name, "cat": category, "ph": "X", "pid": pid, "tid": tid,
+            "ts": round((start - _ORIGIN) * 1e6, 1), "dur": round((end - start) * 1e6, 1), "args": args}
+
+
+def _lane_id(category, lane):
+    names = [name for name, _ in CATEGORIES]
+    base = (names.index(category) + 1 if category in names else len(names) + 1) * 100
+    return base + lane
+
+
+def current_trace():
+    """Returns the trace of the turn running in this context, or None."""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def use_trace(trace):
+    """Makes `trace` the current trace for this context (and threads and tasks that copy it)."""
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+@contextlib.contextmanager
+def span(name, category, **args):
+    """Records a span on the current trace; does nothing outside a traced turn."""
+    trace = _current.get()
+    if trace is None:
+        yield args
+        return
+    with trace.span(name, category, **args) as span_args:
+        yield span_args
+
+
+def _format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024 or unit == "MB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_breakdown(trace, request_stats=None):
+    """Renders a trace as plain text lines: totals per category, then each LLM and tool call."""
+    totals = trace.breakdown()
+    lines = [f"Turn: {trace.seconds:.2f}s"]
+    spans = trace.snapshot()
+    for category, label in CATEGORIES:
+        total = totals[category]
+        if not total["count"]:
+            continue
+        line = f"  {label + ':':<16}{total['count']:>4} x  {total['seconds']:7.3f}s"
+        if category == "memory" and any(span["args"].get("background") for span in spans if span["cat"] == "memory"):
+            line += "  (in background)"
+        lines.append(line)
+        if category == "llm":
+            for span in (span for span in spans if span["cat"] == "llm"):
+                args = span["args"]
+                parts = [f"first token {args['ttft_s']:.2f}s"] if args.get("ttft_s") is not None else []
+                parts.append(f"total {span['end'] - span['start']:.2f}s")
+                if args.get("total_tokens"):
+                    parts.append(f"{args['total_tokens']} tokens")
+                lines.append(f"    {args.get('model') or span['name']}: " + ", ".join(parts))
+        elif category == "tool":
+            for span in (span for span in spans if span["cat"] == "tool"):
+                args = span["args"]
+                lines.append(f"    {span['name']}: {span['end'] - span['start']:.3f}s, "
+                             f"{_format_bytes(args.get('bytes_in', 0))} in, {_format_bytes(args.get('bytes_out', 0))} out")
+    if request_stats and request_stats.get("requests"):
+        lines.append(f"  API requests:   {request_stats['requests']:>4} x  slowest {request_stats['max_latency_s']:.2f}s,"
+                     f" {request_stats['retries']} retried")
+    if trace.errors:
+        lines.append(f"Errors ({len(trace.errors)}):")
+        lines.extend(f"  {error}" for error in trace.errors)
+    else:
+        lines.append("No errors.")
+    return lines
+
+
+class TraceFile:
+    """Accumulates turn traces and (re)writes them as one Chrome trace JSON file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.traces = []
+
+    def record(self, trace):
+        if trace not in self.traces:
+            self.traces.append(trace)
+        self.write()
+
+    def write(self):
+        """Rewrites the file; spans added since (e.g. background summaries) are included."""
+        pid = os.getpid()
+        events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": 1, "args": {"name": "turn"}}]
+        events += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": _lane_id(category, 0), "args": {"name": label}}
+                   for category, label in CATEGORIES]
+        for index, trace in enumerate(self.traces, 1):
+            events += trace.to_events(pid, index)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,296 @@
+"""Shared HTTP connection pool for the xAI endpoint.
+
+One sync and one async `httpx` client are built lazily and shared by every agent, the
+summarizer and batch workers, so connections (and their TLS sessions) are kept alive and
+reused instead of being re-established per agent. HTTP/2 is used when the optional `h2`
+package is installed (`pip install grok-cli[http2]`) and the server negotiates it.
+
+Both clients retry 429 and 5xx responses, and failed connection attempts, with jittered
+exponential backoff that honors `Retry-After`. The openai SDK's own retries should be
+turned off (`max_retries=0`) when these clients are used so requests are not retried twice.
+Each request's latency and retry count is recorded for `track_requests()` blocks.
+"""
+import asyncio
+import contextlib
+import contextvars
+import email.utils
+import importlib.util
+import os
+import random
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Optional
+
+import httpx
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ[name])
+    except (KeyError, ValueError):
+        return default
+
+
+@dataclass
+class HttpConfig:
+    """Pool, timeout and retry settings. Timeouts default from `GROK_CLI_*` environment variables."""
+    connect_timeout: float = field(default_factory=lambda: _env_float("GROK_CLI_CONNECT_TIMEOUT", 10.0))
+    read_timeout: float = field(default_factory=lambda: _env_float("GROK_CLI_READ_TIMEOUT", 300.0))
+    write_timeout: float = 30.0
+    pool_timeout: float = 30.0
+    max_connections: int = 32
+    max_keepalive_connections: int = 16
+    keepalive_expiry: float = 120.0
+    max_retries: int = field(default_factory=lambda: int(_env_float("GROK_CLI_MAX_RETRIES", 4)))
+    backoff_base: float = 0.5
+    backoff_max: float = 30.0
+    http2: Optional[bool] = None  # None: use HTTP/2 when `h2` is installed
+
+    def timeout(self):
+        return httpx.Timeout(connect=self.connect_timeout, read=self.read_timeout,
+                             write=self.write_timeout, pool=self.pool_timeout)
+
+    def limits(self):
+        return httpx.Limits(max_connections=self.max_connections,
+                            max_keepalive_connections=self.max_keepalive_connections,
+                            keepalive_expiry=self.keepalive_expiry)
+
+    def use_http2(self):
+        if self.http2 is None:
+            return importlib.util.find_spec("h2") is not None
+        return self.http2
+
+
+def _retry_after(response):
+    """Parses `retry-after-ms` or `Retry-After` (seconds or an HTTP date); None if absent or invalid."""
+    retry_after_ms = response.headers.get("retry-after-ms")
+    retry_after = response.headers.get("retry-after")
+    with contextlib.suppress(ValueError):
+        if retry_after_ms is not None:
+            return float(retry_after_ms) / 1000
+        if retry_after is not None:
+            return float(retry_after)
+    with contextlib.suppress(TypeError, ValueError):
+        return email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time()
+    return None
+
+
+def retry_delay(response, attempt, config):
+    """Seconds to wait before retry number `attempt` (1-based), preferring the server's `Retry-After`."""
+    server_delay = _retry_after(response) if response is not None else None
+    if server_delay is not None:
+        return min(max(server_delay, 0.0), config.backoff_max)
+    # Full jitter keeps concurrent workers from retrying in lockstep
+    return random.uniform(0, min(config.backoff_base * 2 ** (attempt - 1), config.backoff_max))
+
+
+# --- Request statistics ---
+
+_request_log = contextvars.ContextVar("grok_cli_request_log", default=None)
+_retry_listeners = []
+_totals_lock = threading.Lock()
+_totals = {"requests": 0, "retries": 0, "failed": 0, "latency_s": 0.0}
+
+
+def add_retry_listener(callback):
+    """Registers `callback(status)` to be called before each retry; status is None for connection errors."""
+    _retry_listeners.append(callback)
+
+
+def remove_retry_listener(callback):
+    with contextlib.suppress(ValueError):
+        _retry_listeners.remove(callback)
+
+
+def _record(request, status, started, retries):
+    latency = time.perf_counter() - started
+    entry = {"method": request.method, "path": request.url.path, "status": status,
+             "latency_s": round(latency, 4), "retries": retries}
+    log = _request_log.get()
+    if log is not None:
+        log.append(entry)
+    with _totals_lock:
+        _totals["requests"] += 1
+        _totals["retries"] += retries
+        _totals["failed"] += status is None or status >= 400
+        _totals["latency_s"] += latency
+
+
+def _notify_retry(status):
+    for callback in list(_retry_listeners):
+        callback(status)
+
+
+@contextlib.contextmanager
+def track_requests():
+    """Collects one entry per HTTP request made in this context (threads and tasks that copy it included).
+
+    Yields:
+        list: Entries with method, path, status, latency_s (time to response headers) and retries.
+    """
+    log = []
+    token = _request_log.set(log)
+    try:
+        yield log
+    finally:
+        _request_log.reset(token)
+
+
+def summarize_requests(log):
+    """Aggregates a `track_requests()` log into counts and latency figures."""
+    latencies = [entry["latency_s"] for entry in log]
+    return {
+        "requests": len(log),
+        "retries": sum(entry["retries"] for entry in log),
+        "failed": sum(1 for entry in log if entry["status"] is None or entry["status"] >= 400),
+        "total_latency_s": round(sum(latencies), 3),
+        "max_latency_s": round(max(latencies, default=0.0), 3),
+    }
+
+
+def transport_stats():
+    """Process-wide request totals since startup."""
+    with _totals_lock:
+        return dict(_totals, latency_s=round(_totals["latency_s"], 3))
+
+
+# --- Transports ---
+
+class RetryTransport(httpx.BaseTransport):
+    """Sync transport that retries transient failures of the wrapped transport."""
+
+    def __init__(self, transport, config):
+        self._transport = transport
+        self._config = config
+
+    def handle_request(self, request):
+        started = time.perf_counter()
+        retries = 0
+        while True:
+            try:
+                response = self._transport.handle_request(request)
+            except RETRY_EXCEPTIONS:
+                if retries >= self._config.max_retries:
+                    _record(request, None, started, retries)
+                    raise
+                retries += 1
+                _notify_retry(None)
+                time.sleep(retry_delay(None, retries, self._config))
+                continue
+            if response.status_code in RETRY_STATUSES and retries < self._config.max_retries:
+                retries += 1
+                delay = retry_delay(response, retries, self._config)
+                response.read()  # Drain the small error body so the connection goes back to the pool
+                response.close()
+                _notify_retry(response.status_code)
+                time.sleep(delay)
+                continue
+            _record(request, response.status_code, started, retries)
+            return response
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncRetryTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of `RetryTransport`.
+
+    Pooled connections belong to the event loop that opened them, so a separate pool is
+    kept per running loop; a loop that lives across turns keeps its connections warm.
+    """
+
+    def __init__(self, make_transport, config):
+        self._make_transport = make_transport
+        self._config = config
+        self._transports = weakref.WeakKeyDictionary()
+
+    def _transport(self):
+        loop = asyncio.get_running_loop()
+        transport = self._transports.get(loop)
+        if transport is None:
+            transport = self._transports[loop] = self._make_transport()
+        return transport
+
+    async def handle_async_request(self, request):
+        transport = self._transport()
+        started = time.perf_counter()
+        retries = 0
+        while True:
+            try:
+                response = await transport.handle_async_request(request)
+            except RETRY_EXCEPTIONS:
+                if retries >= self._config.max_retries:
+                    _record(request, None, started, retries)
+                    raise
+                retries += 1
+                _notify_retry(None)
+                await asyncio.sleep(retry_delay(None, retries, self._config))
+                continue
+            if response.status_code in RETRY_STATUSES and retries < self._config.max_retries:
+                retries += 1
+                delay = retry_delay(response, retries, self._config)
+                await response.aread()
+                await response.aclose()
+                _notify_retry(response.status_code)
+                await asyncio.sleep(delay)
+                continue
+            _record(request, response.status_code, started, retries)
+            return response
+
+    async def aclose(self):
+        transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+# --- Shared clients ---
+
+_config = None
+_clients_lock = threading.Lock()
+_http_client = None
+_async_http_client = None
+
+
+def configure(**settings):
+    """Overrides `HttpConfig` fields for clients created from now on. Call before the first agent is built."""
+    global _config, _http_client, _async_http_client
+    with _clients_lock:
+        _config = HttpConfig(**settings)
+        _http_client = None
+        _async_http_client = None
+
+
+def get_config():
+    global _config
+    if _config is None:
+        _config = HttpConfig()
+    return _config
+
+
+def get_http_client():
+    """Returns the process-wide sync client, creating it on first use."""
+    global _http_client
+    with _clients_lock:
+        if _http_client is None:
+            config = get_config()
+            inner = httpx.HTTPTransport(http2=config.use_http2(), limits=config.limits())
+            _http_client = httpx.Client(transport=RetryTransport(inner, config), timeout=config.timeout())
+        return _http_client
+
+
+def get_async_http_client():
+    """Returns the process-wide async client, creating it on first use."""
+    global _async_http_client
+    with _clients_lock:
+        if _async_http_client is None:
+            config = get_config()
+            transport = AsyncRetryTransport(
+                lambda: httpx.AsyncHTTPTransport(http2=config.use_http2(), limits=config.limits()), config
+            )
+            _async_http_client = httpx.AsyncClient(transport=transport, timeout=config.timeout())
+        return _async_http_client
@@ -0,0 +1,357 @@
+"""Persistent index of the files in a workspace, for recursive listing and content search.
+
+The index is built with an `os.scandir` walk that honors `.gitignore` files (and
+`.git/info/exclude`) and is saved under the user cache directory. Refreshing re-lists a
+directory only when its mtime or its ignore files changed; everything else is reused.
+Text files are summarized by their set of lowercase byte trigrams, so a literal search
+only opens files that can contain the query.
+"""
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+
+from . import file_cache
+from .paths import cache_dir
+
+INDEX_VERSION = 1
+MAX_INDEX_FILE_BYTES = 512 * 1024  # Larger text files are never filtered out, just scanned
+MAX_SCAN_FILE_BYTES = 16 << 20  # Search skips (and reports) files bigger than this
+MAX_LINE_CHARS = 200
+
+
+def glob_to_regex(pattern):
+    """Translates a gitignore-style glob (`*`, `?`, `[...]`, `**`) into a regex for relative paths."""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**", i):
+                i += 2
+                if i < n and pattern[i] == "/":
+                    out.append("(?:.*/)?")
+                    i += 1
+                else:
+                    out.append(".*")
+                continue
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[" and pattern.find("]", i + 2) != -1:
+            j = pattern.find("]", i + 2)
+            body = pattern[i + 1:j].replace("\\", "\\\\")
+            out.append("[" + ("^" + body[1:] if body.startswith("!") else body) + "]")
+            i = j + 1
+            continue
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return re.compile("".join(out) + r"\Z")
+
+
+def _parse_ignore_file(path):
+    rules = []
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return rules
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        if line.startswith("\\"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        anchored = "/" in line
+        rules.append((glob_to_regex(line.lstrip("/")), negate, dir_only, anchored))
+    return rules
+
+
+def _is_ignored(rule_stack, rel_path, is_dir):
+    """Applies the rules of every enclosing ignore file; the last matching rule wins."""
+    ignored = False
+    for base, rules in rule_stack:
+        sub_path = rel_path[len(base) + 1:] if base else rel_path
+        name = sub_path.rsplit("/", 1)[-1]
+        for regex, negate, dir_only, anchored in rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(sub_path if anchored else name):
+                ignored = not negate
+    return ignored
+
+
+def _mtime_or_none(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _trigrams(data):
+    return {data[i:i + 3] for i in range(len(data) - 2)}
+
+
+def _has_trigram(blob, gram):
+    """Binary search in a sorted, concatenated run of 3-byte trigrams."""
+    lo, hi = 0, len(blob) // 3
+    while lo < hi:
+        mid = (lo + hi) // 2
+        candidate = blob[mid * 3:mid * 3 + 3]
+        if candidate == gram:
+            return True
+        if candidate < gram:
+            lo = mid + 1
+        else:
+            hi = mid
+    return False
+
+
+class WorkspaceIndex:
+    """File listing and trigram index for one workspace root, persisted between runs."""
+
+    def __init__(self, root):
+        self.root = os.path.realpath(root)
+        self.index_path = os.path.join(
+            cache_dir("index"), hashlib.sha1(self.root.encode("utf-8")).hexdigest() + ".pickle"
+        )
+        self._dirs = {}  # rel dir -> {"mtime", "ignore", "files", "subdirs"}
+        self._files = {}  # rel path -> [size, mtime_ns, kind, trigram blob]; kind is None until indexed
+        self._rules = {}  # ignore file path -> (mtime_ns, parsed rules)
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            return
+        if state.get("version") == INDEX_VERSION and state.get("root") == self.root:
+            self._dirs, self._files = state["dirs"], state["files"]
+
+    def _save(self):
+        state = {"version": INDEX_VERSION, "root": self.root, "dirs": self._dirs, "files": self._files}
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.index_path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+    def _ignore_rules(self, path):
+        mtime = _mtime_or_none(path)
+        if mtime is None:
+            return None, []
+        cached = self._rules.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = self._rules[path] = (mtime, _parse_ignore_file(path))
+        return mtime, cached[1]
+
+    def refresh(self, contents=False):
+        """Brings the index up to date with the filesystem.
+
+        Directory listings are reused while the directory's mtime and ignore files are
+        unchanged. With `contents=True` every file is also stat'ed and files whose size or
+        mtime changed get their trigrams recomputed, which content search needs.
+        """
+        with self._lock:
+            seen_dirs, seen_files = set(), set()
+            changed = self._walk("", [], False, contents, seen_dirs, seen_files)
+            for rel_dir in set(self._dirs) - seen_dirs:
+                del self._dirs[rel_dir]
+                changed = True
+            for rel_path in set(self._files) - seen_files:
+                del self._files[rel_path]
+                changed = True
+            if changed:
+                self._save()
+
+    def _walk(self, rel_dir, rule_stack, force, contents, seen_dirs, seen_files):
+        abs_dir = os.path.join(self.root, rel_dir) if rel_dir else self.root
+        try:
+            dir_mtime = os.stat(abs_dir).st_mtime_ns
+        except OSError:
+            return False
+        changed = False
+
+        ignore_files = [os.path.join(abs_dir, ".gitignore")]
+        if not rel_dir:
+            ignore_files.append(os.path.join(abs_dir, ".git", "info", "exclude"))
+        ignore_key, rules = [], []
+        for path in ignore_files:
+            mtime, parsed = self._ignore_rules(path)
+            ignore_key.append(mtime)
+            rules.extend(parsed)
+        ignore_key = tuple(ignore_key)
+        if rules:
+            rule_stack = rule_stack + [(rel_dir, rules)]
+
+        entry = self._dirs.get(rel_dir)
+        force = force or entry is None or entry["ignore"] != ignore_key
+        stats = None
+        if not force and entry["mtime"] == dir_mtime:
+            files, subdirs = entry["files"], entry["subdirs"]
+        else:
+            files, subdirs, stats = [], [], {}
+            try:
+                with os.scandir(abs_dir) as entries:
+                    for dir_entry in entries:
+                        if dir_entry.name == ".git":
+                            continue
+                        rel_path = f"{rel_dir}/{dir_entry.name}" if rel_dir else dir_entry.name
+                        try:
+                            if dir_entry.is_dir(follow_symlinks=False):
+                                if not _is_ignored(rule_stack, rel_path, True):
+                                    subdirs.append(dir_entry.name)
+                            elif dir_entry.is_file() and not _is_ignored(rule_stack, rel_path, False):
+                                files.append(dir_entry.name)
+                                stats[dir_entry.name] = dir_entry.stat()
+                        except OSError:
+                            continue
+            except OSError:
+                return False
+            self._dirs[rel_dir] = {"mtime": dir_mtime, "ignore": ignore_key, "files": files, "subdirs": subdirs}
+            changed = True
+        seen_dirs.add(rel_dir)
+
+        for name in files:
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            record = self._files.get(rel_path)
+            if record is None or contents or stats is not None:
+                st = stats.get(name) if stats else None
+                if st is None:
+                    try:
+                        st = os.stat(os.path.join(abs_dir, name))
+                    except OSError:
+                        continue
+                if record is None or (record[0], record[1]) != (st.st_size, st.st_mtime_ns):
+                    record = self._files[rel_path] = [st.st_size, st.st_mtime_ns, None, None]
+                    changed = True
+            seen_files.add(rel_path)
+            if contents and record[2] is None:
+                self._index_file(rel_path, record)
+                changed = True
+
+        for name in subdirs:
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            changed |= self._walk(rel_path, rule_stack, force, contents, seen_dirs, seen_files)
+        return changed
+
+    def _index_file(self, rel_path, record):
+        if record[0] > MAX_INDEX_FILE_BYTES:
+            record[2] = "large"
+            return
+        try:
+            with open(os.path.join(self.root, rel_path), "rb") as f:
+                data = f.read()
+        except OSError:
+            record[2] = "unreadable"
+            return
+        if b"\0" in data[:8192]:
+            record[2] = "binary"
+            return
+        record[2] = "text"
+        record[3] = b"".join(sorted(_trigrams(data.lower())))
+
+    def _matching_paths(self, pattern):
+        if not pattern:
+            return sorted(self._files)
+        regex = glob_to_regex(pattern)
+        if "/" in pattern:
+            return sorted(path for path in self._files if regex.match(path))
+        return sorted(path for path in self._files if regex.match(path.rsplit("/", 1)[-1]))
+
+    def glob(self, pattern="**/*", max_results=500):
+        """Lists indexed files whose relative path matches `pattern`.
+
+        A pattern without `/` is matched against file names at any depth (`*.py`);
+        otherwise against the whole relative path (`src/**/test_*.py`).
+        """
+        started = time.perf_counter()
+        self.refresh()
+        with self._lock:
+            paths = self._matching_paths(pattern)
+        return {
+            "files": paths[:max_results],
+            "total": len(paths),
+            "truncated": len(paths) > max_results,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    def search(self, query, pattern=None, regex=False, case_sensitive=True, max_results=100):
+        """Finds lines matching `query` in the indexed text files, optionally limited by a glob.
+
+        Literal queries of three or more bytes only open files whose trigram set contains
+        every trigram of the query.
+
+        Raises:
+            re.error: If `regex` is set and `query` is not a valid regular expression.
+        """
+        started = time.perf_counter()
+        flags = 0 if case_sensitive else re.IGNORECASE
+        matcher = re.compile(query if regex else re.escape(query), flags)
+        grams = set() if regex else _trigrams(query.encode("utf-8").lower())
+        self.refresh(contents=True)
+        with self._lock:
+            candidates = [(path, *self._files[path]) for path in self._matching_paths(pattern)]
+
+        matches, files_scanned, skipped, truncated = [], 0, [], False
+        for path, size, _, kind, blob in candidates:
+            if kind not in ("text", "large"):
+                continue
+            if size > MAX_SCAN_FILE_BYTES:
+                skipped.append(path)
+                continue
+            if grams and kind == "text" and not all(_has_trigram(blob, gram) for gram in grams):
+                continue
+            files_scanned += 1
+            try:
+                text = file_cache.read_bytes(os.path.join(self.root, path)).decode("utf-8", errors="replace")
+            except OSError:
+                continue
+            for line_number, line in enumerate(text.splitlines(), 1):
+                if matcher.search(line):
+                    if len(matches) >= max_results:
+                        truncated = True
+                        break
+                    matches.append({"path": path, "line": line_number, "text": line.strip()[:MAX_LINE_CHARS]})
+            if truncated:
+                break
+        return {
+            "matches": matches,
+            "files_scanned": files_scanned,
+            "files_indexed": len(candidates),
+            "skipped_large_files": skipped,
+            "truncated": truncated,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(root=None):
+    """Returns the shared index for `root` (the current directory by default)."""
+    root = os.path.realpath(root or os.getcwd())
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = _indexes[root] = WorkspaceIndex(root)
+        return index
@@ -10,7 +10,11 @@ setup(
         'langchain',
         'langchain_openai',
         'langchain_community',
+        'httpx',
     ],
+    extras_require={
+        'http2': ['httpx[http2]'],
+    },
     entry_points={
         'console_scripts': [
             'grok_cli = grok_cli.cli:main',
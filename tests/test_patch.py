@@ -0,0 +1,99 @@
+import os
+
+from grok_cli.patch import apply_patch
+
+BLOCK = ["def helper():", "    x = 1", "    return x", ""]
+
+
+def _write(path, lines):
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read().split("\n")[:-1]
+
+
+def test_hunk_after_insertion_applies_to_stated_copy_of_repeated_context(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write("f.py", ["# header"] + BLOCK + ["# middle"] + BLOCK + ["# end"] + BLOCK)
+    # diff -U2: hunk 1 adds five lines, hunk 2 changes the second of three identical blocks
+    patch = "\n".join([
+        "--- a/f.py", "+++ b/f.py",
+        "@@ -1,3 +1,8 @@", " # header", "+# a", "+# b", "+# c", "+# d", "+# e", " def helper():", "     x = 1",
+        "@@ -7,4 +12,5 @@", " def helper():", "     x = 1", "+    x += 1", "     return x", " ",
+    ]) + "\n"
+
+    result = apply_patch(patch)
+
+    assert result["status"] == "success"
+    assert [hunk.get("offset") for hunk in result["files"][0]["hunks"]] == [None, None]
+    assert _read("f.py") == (["# header", "# a", "# b", "# c", "# d", "# e"] + BLOCK + ["# middle"]
+                             + BLOCK[:2] + ["    x += 1"] + BLOCK[2:] + ["# end"] + BLOCK)
+
+
+def test_exact_hunks_report_no_offset(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write("f.txt", [f"line {n}" for n in range(1, 41)])
+    patch = "\n".join([
+        "--- a/f.txt", "+++ b/f.txt",
+        "@@ -2,3 +2,13 @@", " line 2", " line 3"] + [f"+new {n}" for n in range(10)] + [" line 4",
+        "@@ -30,3 +40,3 @@", " line 30", "-line 31", "+line thirty-one", " line 32",
+    ]) + "\n"
+
+    result = apply_patch(patch)
+
+    assert result["status"] == "success"
+    assert [(hunk["line"], hunk.get("offset")) for hunk in result["files"][0]["hunks"]] == [(2, None), (30, None)]
+
+
+def test_drift_of_previous_hunk_carries_to_the_next(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write("f.txt", ["extra 1", "extra 2"] + [f"line {n}" for n in range(1, 21)])
+    patch = "\n".join([
+        "--- a/f.txt", "+++ b/f.txt",
+        "@@ -2,3 +2,3 @@", " line 2", "-line 3", "+line three", " line 4",
+        "@@ -10,3 +10,3 @@", " line 10", "-line 11", "+line eleven", " line 12",
+    ]) + "\n"
+
+    result = apply_patch(patch)
+
+    assert [hunk["offset"] for hunk in result["files"][0]["hunks"]] == [2, 2]
+    assert _read("f.txt")[4] == "line three" and _read("f.txt")[12] == "line eleven"
+
+
+def test_differing_paths_rename_the_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write("old.txt", ["one", "two", "three"])
+    patch = "--- a/old.txt\n+++ b/new.txt\n@@ -1,3 +1,3 @@\n one\n-two\n+2\n three\n"
+
+    result = apply_patch(patch)
+
+    assert result["status"] == "success"
+    assert result["files"][0]["operation"] == "rename"
+    assert not os.path.exists("old.txt")
+    assert _read("new.txt") == ["one", "2", "three"]
+
+
+def test_created_file_gets_default_permissions(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    umask = os.umask(0o022)
+    try:
+        result = apply_patch("--- /dev/null\n+++ b/new.txt\n@@ -0,0 +1 @@\n+hello\n")
+    finally:
+        os.umask(umask)
+
+    assert result["status"] == "success"
+    assert os.stat("new.txt").st_mode & 0o777 == 0o644
+
+
+def test_renamed_file_keeps_its_permissions(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write("run.sh", ["#!/bin/sh", "echo old"])
+    os.chmod("run.sh", 0o755)
+
+    result = apply_patch("--- a/run.sh\n+++ b/bin.sh\n@@ -1,2 +1,2 @@\n #!/bin/sh\n-echo old\n+echo new\n")
+
+    assert result["status"] == "success"
+    assert os.stat("bin.sh").st_mode & 0o777 == 0o755